@@ -0,0 +1,127 @@
+"""Async versions of the hot read endpoints for the ASGI mode.
+
+The views keep using the DRF viewsets: authentication, filtering and
+serialization run unchanged, but on a bounded executor instead of the
+request thread, and the page rows and count are queried concurrently.
+Other methods of the same urls go to the sync viewset.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.urls import URLPattern
+from rest_framework.response import Response
+
+from .mixins import (BatchRetrieveMixin, CatalogSnapshotMixin,
+                     SharedCacheMixin)
+
+ASYNC_METHODS = ("GET", "HEAD")
+LIST_ACTIONS = ("list", "subscriptions")
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.ASYNC_DB_WORKERS, thread_name_prefix="db"
+)
+
+
+def call_and_release(func, *args, **kwargs):
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def run(func, *args, **kwargs):
+    """Runs func on the database executor, the connection of the
+    executor thread is released afterwards as after a request."""
+    return await sync_to_async(
+        call_and_release, thread_sensitive=False, executor=executor
+    )(func, *args, **kwargs)
+
+
+def answered_by_mixin(view, request):
+    """Lists that a mixin serves itself, by ids, from a snapshot or
+    from the shared cache."""
+    params = request.query_params
+    if isinstance(view, BatchRetrieveMixin) and "ids" in params:
+        return True
+    if isinstance(view, SharedCacheMixin) and view.cache_key() is not None:
+        return True
+    return isinstance(view, CatalogSnapshotMixin) and (
+        not params or "since" in params
+    )
+
+
+async def async_list(view, request):
+    queryset = await run(lambda: view.filter_queryset(view.get_queryset()))
+    paginator = view.paginator
+    if paginator is None:
+        rows = await run(list, queryset)
+    else:
+        rows = await paginator.apaginate_queryset(queryset, request, run)
+    data = await run(lambda: view.get_serializer(rows, many=True).data)
+    if paginator is None:
+        return Response(data)
+    return paginator.get_paginated_response(data)
+
+
+async def dispatch(view, request, *args, **kwargs):
+    """APIView.dispatch with every blocking step on the executor."""
+    view.args, view.kwargs = args, kwargs
+    request = view.initialize_request(request, *args, **kwargs)
+    view.request = request
+    view.headers = view.default_response_headers
+    try:
+        await run(view.initial, request, *args, **kwargs)
+        if view.action in LIST_ACTIONS and not answered_by_mixin(
+            view, request
+        ):
+            response = await async_list(view, request)
+        else:
+            handler = getattr(view, view.action)
+            response = await run(handler, request, *args, **kwargs)
+    except Exception as exc:
+        response = view.handle_exception(exc)
+    view.response = view.finalize_response(request, response, *args, **kwargs)
+    if hasattr(view.response, "render"):
+        await run(view.response.render)
+    return view.response
+
+
+def async_read_view(sync_view):
+    """Wraps a view made by a DRF router, safe requests are served
+    asynchronously and the rest by the original view."""
+    cls, initkwargs = sync_view.cls, sync_view.initkwargs
+    actions = {"head": sync_view.actions["get"], **sync_view.actions}
+
+    async def view(request, *args, **kwargs):
+        if request.method not in ASYNC_METHODS:
+            return await sync_to_async(sync_view)(request, *args, **kwargs)
+        instance = cls(**initkwargs)
+        instance.action_map = actions
+        for method, action in actions.items():
+            setattr(instance, method, getattr(instance, action))
+        instance.request = request
+        return await dispatch(instance, request, *args, **kwargs)
+
+    view.cls, view.actions, view.initkwargs = cls, actions, initkwargs
+    view.csrf_exempt = True
+    return view
+
+
+def async_patterns(patterns, actions):
+    """The router patterns with the GET handlers of the given actions
+    served by async_read_view when ASYNC_READ_VIEWS is on."""
+    if not settings.ASYNC_READ_VIEWS:
+        return patterns
+    return [
+        URLPattern(
+            pattern.pattern,
+            async_read_view(pattern.callback),
+            pattern.default_args,
+            pattern.name,
+        )
+        if getattr(pattern.callback, "actions", {}).get("get") in actions
+        else pattern
+        for pattern in patterns
+    ]
@@ -0,0 +1,56 @@
+import threading
+from collections import OrderedDict
+from copy import copy
+from time import monotonic
+
+from django.conf import settings
+from rest_framework.authentication import TokenAuthentication
+
+from . import invalidation
+
+_lock = threading.Lock()
+_tokens = OrderedDict()
+_generation = 0
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication that keeps the users of the recently used
+    tokens in memory while the invalidation bus is listening, so that
+    an authenticated request does not start with the token query."""
+
+    def authenticate_credentials(self, key):
+        if not invalidation.listening():
+            return super().authenticate_credentials(key)
+        with _lock:
+            entry = _tokens.get(key)
+            if entry is not None and entry[2] > monotonic():
+                _tokens.move_to_end(key)
+                return copy(entry[0]), entry[1]
+            generation = _generation
+        user, token = super().authenticate_credentials(key)
+        with _lock:
+            # Not stored when a change arrived while the user loaded.
+            if generation == _generation:
+                _tokens[key] = (
+                    user, token, monotonic() + settings.TOKEN_CACHE_TIMEOUT
+                )
+                while len(_tokens) > settings.TOKEN_CACHE_SIZE:
+                    _tokens.popitem(last=False)
+        return copy(user), token
+
+
+@invalidation.on_change("user")
+def evict(pk=None):
+    """Forgets the tokens of the user, token deletes are published as
+    changes of their user."""
+    global _generation
+    with _lock:
+        _generation += 1
+        for key, (user, _, _) in list(_tokens.items()):
+            if pk is None or user.pk == pk:
+                del _tokens[key]
+
+
+@invalidation.on_reconnect
+def clear():
+    evict()
@@ -0,0 +1,102 @@
+"""Shared cache of read computations, filled by one request at a time.
+
+Entries are (version, fresh until, value). A fresh entry of the current
+version is returned as is. An expired entry, or one of an older version,
+is served for READ_CACHE_STALE more seconds while a single request
+recomputes it. Without a stale value the other requests wait for the
+one computing it: threads of a process share its result and other
+processes poll the cache while a short lived lock key exists.
+"""
+import threading
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeout
+from functools import partial
+from time import monotonic, sleep, time
+
+from django.conf import settings
+from django.core.cache import cache
+
+MISSING = object()
+LOCK_SECONDS = 10
+POLL_SECONDS = 0.02
+
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+def fetch(key, version, compute):
+    """Cached result of compute() for the key and version."""
+    entry = cache.get(key)
+    stale = MISSING
+    if entry is not None:
+        entry_version, fresh_until, value = entry
+        if entry_version == version and time() < fresh_until:
+            return value
+        if time() < fresh_until + settings.READ_CACHE_STALE:
+            stale = value
+    return single_flight(key, partial(fill, key, version, compute), stale)
+
+
+def single_flight(key, func, stale):
+    """Calls func(stale) once per key in this process at a time, the
+    concurrent callers get the stale value or wait for its result."""
+    with _inflight_lock:
+        future = _inflight.get(key)
+        leader = future is None
+        if leader:
+            future = _inflight[key] = Future()
+    if not leader:
+        if stale is not MISSING:
+            return stale
+        try:
+            return future.result(timeout=settings.READ_CACHE_WAIT)
+        except FutureTimeout:
+            return func(stale)
+    try:
+        value = func(stale)
+    except BaseException as exc:
+        future.set_exception(exc)
+        raise
+    else:
+        future.set_result(value)
+        return value
+    finally:
+        with _inflight_lock:
+            del _inflight[key]
+
+
+def fill(key, version, compute, stale):
+    """Recomputes the entry unless another process is doing it."""
+    lock = f"{key}:filling"
+    owner = cache.add(lock, True, LOCK_SECONDS)
+    if not owner:
+        if stale is not MISSING:
+            return stale
+        value = wait_for(key, version, lock)
+        if value is not MISSING:
+            return value
+    try:
+        value = compute()
+        cache.set(
+            key,
+            (version, time() + settings.READ_CACHE_TIMEOUT, value),
+            settings.READ_CACHE_TIMEOUT + settings.READ_CACHE_STALE,
+        )
+        return value
+    finally:
+        if owner:
+            cache.delete(lock)
+
+
+def wait_for(key, version, lock):
+    """Value of the key once another process stores it, MISSING when its
+    lock is gone without one or after READ_CACHE_WAIT seconds."""
+    deadline = monotonic() + settings.READ_CACHE_WAIT
+    while monotonic() < deadline:
+        sleep(POLL_SECONDS)
+        entry = cache.get(key)
+        if entry is not None and entry[0] == version:
+            return entry[2]
+        if cache.get(lock) is None:
+            break
+    return MISSING
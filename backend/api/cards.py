@@ -0,0 +1,83 @@
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from recipes import dimensions
+from recipes.models import Recipe, RecipeCard
+
+from .serializers import RecipeCardSerializer, RecipeListSerializer
+
+CARD_FIELDS = RecipeCardSerializer.Meta.card_fields
+DETAIL_FIELDS = RecipeCardSerializer.Meta.detail_fields
+CHUNK_SIZE = 500
+VERSION_KEY = "cards:version"
+REPAIR_KEY = "cards:repair"
+
+
+def get_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, uuid4().hex, None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def invalidate():
+    """Makes the cached card reads stale once the transaction commits."""
+    transaction.on_commit(
+        lambda: cache.set(VERSION_KEY, uuid4().hex, None)
+    )
+
+
+def build_cards(recipes, fresh_dimensions=False):
+    serializer = RecipeListSerializer(recipes, many=True)
+    if fresh_dimensions:
+        serializer.child.dimensions = dimensions.Dimensions(version=None)
+    cards = []
+    for recipe, data in zip(recipes, serializer.data):
+        data["author"].pop("is_subscribed", None)
+        cards.append(RecipeCard(
+            recipe=recipe,
+            author_id=recipe.author_id,
+            pub_date=recipe.pub_date,
+            card={field: data[field] for field in CARD_FIELDS},
+            detail={field: data[field] for field in DETAIL_FIELDS},
+        ))
+    return cards
+
+
+def refresh_cards(recipes, fresh_dimensions=False):
+    """Rebuilds the cards of the recipes queryset in chunks."""
+    recipe_ids = list(recipes.order_by().values_list("pk", flat=True))
+    if not recipe_ids:
+        return 0
+    with transaction.atomic():
+        for start in range(0, len(recipe_ids), CHUNK_SIZE):
+            chunk = recipe_ids[start:start + CHUNK_SIZE]
+            cards = build_cards(
+                list(
+                    Recipe.objects.filter(pk__in=chunk)
+                    .select_related("author")
+                ),
+                fresh_dimensions=fresh_dimensions,
+            )
+            RecipeCard.objects.filter(pk__in=chunk).delete()
+            RecipeCard.objects.bulk_create(cards)
+        invalidate()
+    return len(recipe_ids)
+
+
+def build_missing(recipes=None):
+    """Builds the cards of the recipes that have none, such as rows
+    written by bulk or raw paths. Returns the number built."""
+    if recipes is None:
+        recipes = Recipe.objects.all()
+    return refresh_cards(recipes.filter(card__isnull=True))
+
+
+def repair_missing():
+    """build_missing() at most once per CARD_REPAIR_INTERVAL seconds
+    across the workers."""
+    if cache.add(REPAIR_KEY, True, settings.CARD_REPAIR_INTERVAL):
+        build_missing()
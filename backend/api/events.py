@@ -0,0 +1,245 @@
+"""Server-sent events with the favorite, cart and subscription changes
+of a user, so that their other tabs and devices update without
+refetching. Served by foodgram.asgi at EVENTS_PATH, so the server has to
+run with SERVER_MODE=asgi, and with several workers EVENTS_BROKER has to
+be PostgresBroker.
+
+EventSource in browsers can not send headers. Instead of putting the API
+token into the url, and into the access logs, a client gets a ticket
+from EVENTS_TICKET_PATH and opens EVENTS_PATH?ticket=<ticket>. A ticket
+works once and for EVENTS_TICKET_TIMEOUT seconds.
+"""
+import asyncio
+import json
+import logging
+import secrets
+import select
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from functools import lru_cache, partial
+from time import sleep
+from urllib.parse import parse_qs
+
+import psycopg2
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.utils.module_loading import import_string
+from rest_framework.authtoken.models import Token
+
+from .asynchronous import run
+
+logger = logging.getLogger("foodgram.events")
+
+EVENTS_PATH = "/api/users/me/events/"
+EVENTS_TICKET_PATH = "/api/users/me/events/ticket/"
+CHANNEL = "foodgram_events"
+QUEUE_SIZE = 100
+UNAUTHORIZED = "Authentication credentials were not provided."
+
+
+class LocalBroker:
+    """Delivers the events to the streams open in this process."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.streams = defaultdict(set)
+
+    def publish(self, user_id, event):
+        self.deliver(user_id, event)
+
+    def deliver(self, user_id, event):
+        with self.lock:
+            streams = list(self.streams.get(user_id, ()))
+        for loop, queue in streams:
+            loop.call_soon_threadsafe(put_latest, queue, event)
+
+    @contextmanager
+    def subscribe(self, user_id):
+        """Queue of the user's events while the block runs."""
+        stream = (asyncio.get_running_loop(), asyncio.Queue(QUEUE_SIZE))
+        with self.lock:
+            self.streams[user_id].add(stream)
+        try:
+            yield stream[1]
+        finally:
+            with self.lock:
+                self.streams[user_id].discard(stream)
+                if not self.streams[user_id]:
+                    del self.streams[user_id]
+
+
+class PostgresBroker(LocalBroker):
+    """Publishes with NOTIFY, every process LISTENs on a thread of its
+    own and delivers to its streams, for several workers or nodes."""
+
+    def __init__(self):
+        super().__init__()
+        self.listener = None
+
+    def publish(self, user_id, event):
+        with connections["default"].cursor() as cursor:
+            cursor.execute(
+                "SELECT pg_notify(%s, %s)",
+                (CHANNEL, json.dumps({"user": user_id, "event": event})),
+            )
+
+    @contextmanager
+    def subscribe(self, user_id):
+        with self.lock:
+            if self.listener is None:
+                self.listener = threading.Thread(
+                    target=self.listen, name="events-listener", daemon=True
+                )
+                self.listener.start()
+        with super().subscribe(user_id) as queue:
+            yield queue
+
+    def listen(self):
+        params = connections["default"].get_connection_params()
+        while True:
+            connection = None
+            try:
+                connection = psycopg2.connect(**params)
+                connection.autocommit = True
+                with connection.cursor() as cursor:
+                    cursor.execute(f"LISTEN {CHANNEL}")
+                    while True:
+                        if select.select([connection], [], [], 5) == (
+                            [], [], []
+                        ):
+                            # Notices a dropped connection while idle.
+                            cursor.execute("SELECT 1")
+                        connection.poll()
+                        while connection.notifies:
+                            notify = connection.notifies.pop(0)
+                            payload = json.loads(notify.payload)
+                            self.deliver(payload["user"], payload["event"])
+            except Exception:
+                logger.exception("events listener lost its connection")
+            finally:
+                if connection is not None:
+                    connection.close()
+            sleep(1)
+
+
+def put_latest(queue, event):
+    """Drops the oldest event of a client that does not keep up."""
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(event)
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    return import_string(settings.EVENTS_BROKER)()
+
+
+def publish(user_id, kind, object_id, value):
+    """Sends {"type", "id", "value"} to the user's streams once the
+    current transaction commits."""
+    event = {"type": kind, "id": object_id, "value": value}
+    transaction.on_commit(partial(get_broker().publish, user_id, event))
+
+
+def ticket_key(ticket):
+    return f"events-ticket:{ticket}"
+
+
+def issue_ticket(user_id):
+    ticket = secrets.token_urlsafe(32)
+    cache.set(ticket_key(ticket), user_id, settings.EVENTS_TICKET_TIMEOUT)
+    return ticket
+
+
+def redeem_ticket(ticket):
+    """User id of the ticket, None when it expired or was used, only
+    the request that deletes it gets the id."""
+    key = ticket_key(ticket)
+    user_id = cache.get(key)
+    if user_id is None or not cache.delete(key):
+        return None
+    return user_id
+
+
+async def authenticate(scope):
+    """User id of the token in the Authorization header or of the
+    ?ticket= from EVENTS_TICKET_PATH."""
+    authorization = dict(scope["headers"]).get(b"authorization", b"")
+    if authorization.startswith(b"Token "):
+        key = authorization[len(b"Token "):].decode()
+        return await run(
+            Token.objects.filter(key=key).values_list("user_id", flat=True)
+            .first
+        )
+    query = parse_qs(scope["query_string"].decode())
+    ticket = query.get("ticket", [None])[0]
+    if not ticket:
+        return None
+    return await run(redeem_ticket, ticket)
+
+
+async def send_body(send, text):
+    await send({
+        "type": "http.response.body",
+        "body": text.encode(),
+        "more_body": True,
+    })
+
+
+async def wait_for_disconnect(receive):
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+async def events_app(scope, receive, send):
+    """Raw ASGI app streaming the events of the authenticated user."""
+    user_id = await authenticate(scope)
+    if user_id is None:
+        await send({
+            "type": "http.response.start",
+            "status": 401,
+            "headers": [(b"content-type", b"application/json")],
+        })
+        await send({
+            "type": "http.response.body",
+            "body": json.dumps({"detail": UNAUTHORIZED}).encode(),
+        })
+        return
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [
+            (b"content-type", b"text/event-stream"),
+            (b"cache-control", b"no-cache"),
+            (b"x-accel-buffering", b"no"),
+        ],
+    })
+    await send_body(send, "retry: 5000\n\n")
+    disconnected = asyncio.ensure_future(wait_for_disconnect(receive))
+    with get_broker().subscribe(user_id) as queue:
+        try:
+            while True:
+                event = asyncio.ensure_future(queue.get())
+                done, _ = await asyncio.wait(
+                    (event, disconnected),
+                    timeout=settings.EVENTS_HEARTBEAT,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if disconnected in done:
+                    event.cancel()
+                    break
+                if event in done:
+                    message = event.result()
+                    await send_body(
+                        send,
+                        f"event: {message['type']}\n"
+                        f"data: {json.dumps(message)}\n\n",
+                    )
+                else:
+                    event.cancel()
+                    await send_body(send, ": ping\n\n")
+        finally:
+            disconnected.cancel()
+    await send({"type": "http.response.body", "body": b""})
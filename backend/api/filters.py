@@ -1,6 +1,8 @@
-from django_filters import AllValuesMultipleFilter
-from django_filters.rest_framework import BooleanFilter, FilterSet, filters
-from recipes.models import Ingredient, Recipe
+from django_filters.rest_framework import (BooleanFilter, FilterSet,
+                                           MultipleChoiceFilter, filters)
+from recipes import dimensions
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeCard,
+                            ShoppingCart)
 
 
 class IngredientSearchFilter(FilterSet):
@@ -11,26 +13,48 @@ class IngredientSearchFilter(FilterSet):
         fields = ("name",)
 
 
+def tag_choices():
+    tags = dimensions.current().tags.values()
+    return [(tag.slug, tag.name) for tag in tags]
+
+
 class RecipeFilter(FilterSet):
-    tags = AllValuesMultipleFilter(
-        field_name="tags__slug",
-    )
+    tags = MultipleChoiceFilter(method="filter_tags", choices=tag_choices)
 
     is_favorited = BooleanFilter(method="filter_is_favorited")
     is_in_shopping_cart = BooleanFilter(method="filter_is_in_shopping_cart")
 
     class Meta:
-        model = Recipe
+        model = RecipeCard
         fields = ("tags", "author")
 
+    def filter_tags(self, queryset, name, value):
+        tag_ids = [
+            tag.id for tag in dimensions.current().tags.values()
+            if tag.slug in value
+        ]
+        return queryset.filter(
+            recipe_id__in=Recipe.tags.through.objects.filter(
+                tag_id__in=tag_ids
+            ).values("recipe_id")
+        )
+
     def filter_is_favorited(self, queryset, name, value):
         user = self.request.user
         if value and not user.is_anonymous:
-            return queryset.filter(favorite__user=user)
+            return queryset.filter(
+                recipe_id__in=Favorite.objects.filter(user=user).values(
+                    "recipe_id"
+                )
+            )
         return queryset
 
     def filter_is_in_shopping_cart(self, queryset, name, value):
         user = self.request.user
         if value and not user.is_anonymous:
-            return queryset.filter(shopping_cart__user=user)
+            return queryset.filter(
+                recipe_id__in=ShoppingCart.objects.filter(user=user).values(
+                    "recipe_id"
+                )
+            )
         return queryset
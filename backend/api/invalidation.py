@@ -0,0 +1,146 @@
+"""Invalidation of the caches a process keeps in its own memory.
+
+The post_save and post_delete hooks in api.signals publish ["model", id]
+messages for the models that have handlers, id None for all the rows.
+Bulk writes skip the hooks and publish themselves, as load_catalog does.
+The raw deletes of recipes.deletion and users.purge do not, they only
+remove recipes, follows, favorites and cart items, which no process
+caches. LocalBus delivers them to the process
+that made the change only. PostgresBus sends them with NOTIFY, which the
+database delivers on commit, and every process LISTENs on a thread of
+its own. Caches trust their memory only while listening() is true. The
+messages sent while a listener reconnects are lost, so it runs the
+on_reconnect checks, which compare the cache versions, once LISTEN is
+back.
+"""
+import json
+import logging
+import select
+import threading
+from collections import defaultdict
+from functools import lru_cache, partial
+from time import sleep
+
+import psycopg2
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger("foodgram.invalidation")
+
+CHANNEL = "foodgram_invalidation"
+
+handlers = defaultdict(list)
+reconnect_checks = []
+
+
+def on_change(*models):
+    """Registers func(id) for the changes of the model names."""
+    def register(func):
+        for model in models:
+            handlers[model].append(func)
+        return func
+
+    return register
+
+
+def on_reconnect(func):
+    """Registers func() to run whenever the listener (re)connects."""
+    reconnect_checks.append(func)
+    return func
+
+
+class LocalBus:
+    """Evicts the entries of this process, other processes keep
+    validating their caches on every read."""
+
+    def send(self, message):
+        pass
+
+    def deliver(self, message):
+        model, pk = message
+        for handler in handlers[model]:
+            try:
+                handler(pk)
+            except Exception:
+                logger.exception("invalidation of %s %s failed", model, pk)
+
+    def listening(self):
+        return False
+
+
+class PostgresBus(LocalBus):
+    """Sends the messages with NOTIFY on the connection of the change,
+    so they are delivered with its transaction or not at all."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.listener = None
+        self.connected = threading.Event()
+
+    def send(self, message):
+        with connections["default"].cursor() as cursor:
+            cursor.execute(
+                "SELECT pg_notify(%s, %s)", (CHANNEL, json.dumps(message))
+            )
+
+    def listening(self):
+        with self.lock:
+            if self.listener is None:
+                self.listener = threading.Thread(
+                    target=self.listen,
+                    name="invalidation-listener",
+                    daemon=True,
+                )
+                self.listener.start()
+        return self.connected.is_set()
+
+    def listen(self):
+        params = connections["default"].get_connection_params()
+        while True:
+            connection = None
+            try:
+                connection = psycopg2.connect(**params)
+                connection.autocommit = True
+                with connection.cursor() as cursor:
+                    cursor.execute(f"LISTEN {CHANNEL}")
+                    for check in reconnect_checks:
+                        check()
+                    self.connected.set()
+                    while True:
+                        if select.select([connection], [], [], 5) == (
+                            [], [], []
+                        ):
+                            # Notices a dropped connection while idle.
+                            cursor.execute("SELECT 1")
+                        connection.poll()
+                        while connection.notifies:
+                            notify = connection.notifies.pop(0)
+                            self.deliver(json.loads(notify.payload))
+            except Exception:
+                # Also a failed reconnect check, the caches stay
+                # untrusted until one succeeds.
+                self.connected.clear()
+                logger.exception("invalidation listener lost its connection")
+                if connection is not None:
+                    connection.close()
+                sleep(1)
+
+
+@lru_cache(maxsize=None)
+def get_bus():
+    return import_string(settings.INVALIDATION_BUS)()
+
+
+def listening():
+    """True while the other processes' changes reach this one."""
+    return get_bus().listening()
+
+
+def publish(model, pk=None):
+    """Invalidates the row of the model in every process, all of its
+    rows without a pk, once the current transaction commits."""
+    bus = get_bus()
+    message = [model, pk]
+    bus.send(message)
+    transaction.on_commit(partial(bus.deliver, message))
@@ -1,4 +1,14 @@
-from rest_framework import mixins, viewsets
+from hashlib import sha1
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import HttpResponse
+from recipes.catalog import ENCODINGS, catalog_delta, latest_snapshot
+from rest_framework import mixins, serializers, viewsets
+from rest_framework.response import Response
+
+from .cache import fetch
 
 
 class ListCreateMixin(
@@ -8,3 +18,157 @@ class ListCreateMixin(
     returns the list of the objects."""
 
     pass
+
+
+class BatchRetrieveMixin:
+    """Returns the objects listed in ?ids=1,2,3 in the requested order
+    with a single query, instead of one request per object."""
+
+    def list(self, request, *args, **kwargs):
+        if "ids" not in request.query_params:
+            return super().list(request, *args, **kwargs)
+        ids = self.parse_ids(request.query_params["ids"])
+        queryset = self.filter_queryset(self.get_queryset())
+        objects = queryset.in_bulk(ids)
+        serializer = self.get_serializer(
+            [objects[pk] for pk in ids if pk in objects], many=True
+        )
+        return Response(serializer.data)
+
+    def parse_ids(self, value):
+        try:
+            ids = [int(pk) for pk in value.split(",") if pk.strip()]
+        except ValueError:
+            raise serializers.ValidationError(
+                {"ids": "ids should be comma separated integers"}
+            )
+        ids = list(dict.fromkeys(ids))
+        if len(ids) > settings.BATCH_IDS_MAX:
+            raise serializers.ValidationError(
+                {"ids": f"at most {settings.BATCH_IDS_MAX} ids are allowed"}
+            )
+        return ids
+
+
+class SparseFieldsetMixin:
+    """Passes ?fields= and ?expand= to the serializer context."""
+
+    expandable = ()
+
+    def parse_names(self, param, available):
+        value = self.request.query_params.get(param)
+        if value is None:
+            return None
+        names = {name.strip() for name in value.split(",") if name.strip()}
+        unknown = names - set(available)
+        if unknown:
+            raise serializers.ValidationError(
+                {param: f"unknown fields: {', '.join(sorted(unknown))}"}
+            )
+        return names
+
+    def get_fieldset(self):
+        if not hasattr(self, "_fieldset"):
+            meta = getattr(self.get_serializer_class(), "Meta", None)
+            self._fieldset = (
+                self.parse_names("fields", getattr(meta, "fields", ())),
+                self.parse_names("expand", self.expandable),
+            )
+        return self._fieldset
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["fields"], context["expand"] = self.get_fieldset()
+        return context
+
+
+class CatalogSnapshotMixin:
+    """Serves the unfiltered list from the prebuilt snapshot, the
+    regular list until one is built, and the changes after a version
+    with ?since=<version>."""
+
+    catalog = None
+
+    def list(self, request, *args, **kwargs):
+        if "since" in request.query_params:
+            try:
+                since = int(request.query_params["since"])
+            except ValueError:
+                raise serializers.ValidationError(
+                    {"since": "version should be an integer"}
+                )
+            return Response(catalog_delta(self.catalog, since))
+        if not request.query_params:
+            snapshot = latest_snapshot(self.catalog)
+            if snapshot is not None:
+                return self.snapshot_response(request, snapshot)
+        return super().list(request, *args, **kwargs)
+
+    def snapshot_response(self, request, snapshot):
+        accepted = request.META.get("HTTP_ACCEPT_ENCODING", "")
+        name, encoding = snapshot["path"], None
+        for candidate, suffix, _ in ENCODINGS:
+            if candidate in accepted and default_storage.exists(
+                snapshot["path"] + suffix
+            ):
+                name, encoding = snapshot["path"] + suffix, candidate
+                break
+        with default_storage.open(name) as file:
+            response = HttpResponse(
+                file.read(), content_type="application/json"
+            )
+        if encoding:
+            response["Content-Encoding"] = encoding
+        response["Vary"] = "Accept-Encoding"
+        response["X-Catalog-Version"] = snapshot["version"]
+        return response
+
+
+class SharedCacheMixin:
+    """Serves list and retrieve through api.cache, keyed by the request
+    parameters and made stale by a new cache_version()."""
+
+    uncached_params = ()
+
+    def cache_version(self):
+        raise NotImplementedError
+
+    def cache_key(self):
+        """None for requests that depend on the user."""
+        params = self.request.query_params
+        if not settings.READ_CACHE_TIMEOUT or any(
+            param in params for param in self.uncached_params
+        ):
+            return None
+        query = urlencode(sorted(params.lists()), doseq=True)
+        digest = sha1(f"{self.action}:{self.kwargs}:{query}".encode())
+        return f"read:{self.basename}:{digest.hexdigest()}"
+
+    def list(self, request, *args, **kwargs):
+        key = self.cache_key()
+        if key is None:
+            return super().list(request, *args, **kwargs)
+        paginator = self.paginator
+        if paginator is None:
+            rows = fetch(key, self.cache_version(), lambda: list(
+                self.filter_queryset(self.get_queryset())
+            ))
+            return Response(self.get_serializer(rows, many=True).data)
+        count, number, rows = fetch(
+            key,
+            self.cache_version(),
+            lambda: paginator.fetch_page(
+                self.filter_queryset(self.get_queryset()), request
+            ),
+        )
+        paginator.restore_page(count, number, rows, request)
+        serializer = self.get_serializer(rows, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    def retrieve(self, request, *args, **kwargs):
+        key = self.cache_key()
+        if key is None:
+            return super().retrieve(request, *args, **kwargs)
+        instance = fetch(key, self.cache_version(), self.get_object)
+        self.check_object_permissions(request, instance)
+        return Response(self.get_serializer(instance).data)
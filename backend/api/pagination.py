@@ -1,6 +1,63 @@
+import asyncio
+
+from django.core.paginator import InvalidPage
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
 
 
 class CustomPagination(PageNumberPagination):
     page_size_query_param = "limit"
     page_size = 6
+
+    async def apaginate_queryset(self, queryset, request, run):
+        """paginate_queryset with the page rows and the count fetched
+        concurrently, run executes a callable off the event loop."""
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        paginator = self.django_paginator_class(queryset, page_size)
+        page_number = request.query_params.get(self.page_query_param, 1)
+        count = None
+        if page_number in self.last_page_strings:
+            paginator.count = count = await run(queryset.count)
+            page_number = paginator.num_pages
+        try:
+            offset = max(int(page_number) - 1, 0) * page_size
+        except (TypeError, ValueError):
+            offset = 0
+
+        def fetch_rows():
+            return list(queryset[offset:offset + page_size])
+
+        if count is None:
+            paginator.count, rows = await asyncio.gather(
+                run(queryset.count), run(fetch_rows)
+            )
+        else:
+            rows = await run(fetch_rows)
+        try:
+            number = paginator.validate_number(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(
+                page_number=page_number, message=str(exc)
+            ))
+        return self.restore_page(paginator.count, number, rows, request)
+
+    def fetch_page(self, queryset, request):
+        """(count, page number, rows) of paginate_queryset to cache."""
+        rows = self.paginate_queryset(queryset, request)
+        if rows is None:
+            return None
+        return self.page.paginator.count, self.page.number, rows
+
+    def restore_page(self, count, number, rows, request):
+        """Paginator state of a page fetched before, returns its rows."""
+        paginator = self.django_paginator_class((), self.get_page_size(
+            request
+        ))
+        paginator.count = count
+        self.page = paginator._get_page(rows, number, paginator)
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+        self.request = request
+        return rows
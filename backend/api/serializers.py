@@ -2,18 +2,54 @@ from collections import OrderedDict
 
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
-from django.db.models import F
 from django.shortcuts import get_object_or_404
+from django.utils.functional import cached_property
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from drf_extra_fields.fields import Base64ImageField
-from recipes.models import Ingredient, IngredientInRecipe, Recipe, Tag
+from recipes import dimensions
+from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
+                            ShoppingCart, Tag)
 from rest_framework import serializers, status
 from rest_framework.fields import SerializerMethodField
-from users.models import Follow
+from users import graph
 
 User = get_user_model()
 
 
+def recipes_limit(request):
+    """The non-negative ?recipes_limit= of the request, or None."""
+    value = request.GET.get("recipes_limit")
+    if not value:
+        return None
+    if not value.isdecimal():
+        raise serializers.ValidationError(
+            {"recipes_limit": "recipes_limit should be a non-negative integer"}
+        )
+    return int(value)
+
+
+def is_expanded(context, relation):
+    """Relations are expanded unless ?expand= lists other ones."""
+    expand = context.get("expand")
+    return expand is None or relation in expand
+
+
+class SparseFieldsMixin:
+    """Drops the fields missing from ?fields= of the top level serializer."""
+
+    def get_fields(self):
+        fields = super().get_fields()
+        requested = self.context.get("fields")
+        top_level = self.parent is None or (
+            isinstance(self.parent, serializers.ListSerializer)
+            and self.parent.parent is None
+        )
+        if requested is not None and top_level:
+            for name in set(fields) - set(requested):
+                fields.pop(name)
+        return fields
+
+
 class IngredientSerializer(serializers.ModelSerializer):
     class Meta:
         model = Ingredient
@@ -52,7 +88,7 @@ class TagSerializer(serializers.ModelSerializer):
         fields = ("id", "name", "color", "slug")
 
 
-class CustomUserSerializer(UserSerializer):
+class CustomUserSerializer(SparseFieldsMixin, UserSerializer):
     is_subscribed = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
@@ -70,12 +106,10 @@ class CustomUserSerializer(UserSerializer):
         request = self.context.get("request")
         if not request:
             return False
+        if hasattr(obj, "is_subscribed"):
+            return obj.is_subscribed
         user = request.user
-        return (
-            user
-            and user.is_authenticated
-            and user.following.filter(following=obj).exists()
-        )
+        return user.is_authenticated and graph.is_following(user.pk, obj.pk)
 
 
 class RecipeSerializer(serializers.ModelSerializer):
@@ -186,10 +220,19 @@ class RecipeSerializer(serializers.ModelSerializer):
         return RecipeListSerializer(instance, context=context).data
 
 
+class DimensionListSerializer(serializers.ListSerializer):
+    """Loads tag and ingredient ids of the whole page at once."""
+
+    def to_representation(self, data):
+        recipes = list(data.all() if hasattr(data, "all") else data)
+        dimensions.prefetch_dimension_ids(recipes)
+        return super().to_representation(recipes)
+
+
 class RecipeListSerializer(serializers.ModelSerializer):
     author = CustomUserSerializer(read_only=True)
     ingredients = SerializerMethodField()
-    tags = TagSerializer(many=True, read_only=True)
+    tags = SerializerMethodField()
     is_favorited = SerializerMethodField(read_only=True)
     is_in_shopping_cart = SerializerMethodField(read_only=True)
     image = Base64ImageField(max_length=None)
@@ -200,16 +243,29 @@ class RecipeListSerializer(serializers.ModelSerializer):
             "is_favorited",
             "is_in_shopping_cart",
         )
+        list_serializer_class = DimensionListSerializer
+
+    @cached_property
+    def dimensions(self):
+        return dimensions.current()
+
+    def lookup(self, rows, pk):
+        if pk not in getattr(self.dimensions, rows):
+            self.dimensions = dimensions.current(refresh=True)
+        return getattr(self.dimensions, rows)[pk]
 
     def get_ingredients(self, obj):
-        recipe = obj
-        ingredients = recipe.ingredients.values(
-            "id",
-            "name",
-            "measurement_unit",
-            amount=F("ingredientinrecipe__amount")
-        )
-        return ingredients
+        dimensions.prefetch_dimension_ids([obj])
+        ingredients = [
+            dict(self.lookup("ingredients", pk)._asdict(), amount=amount)
+            for pk, amount in obj._ingredient_amounts
+        ]
+        return sorted(ingredients, key=lambda row: row["name"])
+
+    def get_tags(self, obj):
+        dimensions.prefetch_dimension_ids([obj])
+        tags = [self.lookup("tags", pk)._asdict() for pk in obj._tag_ids]
+        return sorted(tags, key=lambda row: row["name"])
 
     def get_is_favorited(self, obj):
         request = self.context.get("request")
@@ -234,6 +290,96 @@ class RecipeListSerializer(serializers.ModelSerializer):
         )
 
 
+class RecipeCardListSerializer(serializers.ListSerializer):
+    """Loads the viewer flags of the whole page at once."""
+
+    def to_representation(self, data):
+        cards = list(data)
+        self.child.load_flags(cards)
+        return super().to_representation(cards)
+
+
+class RecipeCardSerializer(serializers.BaseSerializer):
+    """Recipe read from its card with the flags of the current user."""
+
+    class Meta:
+        fields = RecipeListSerializer.Meta.fields
+        card_fields = ("id", "author", "tags", "image", "name", "cooking_time")
+        detail_fields = ("ingredients", "text")
+        expandable = ("author", "tags", "ingredients")
+        list_serializer_class = RecipeCardListSerializer
+
+    flags = None
+
+    @cached_property
+    def output_fields(self):
+        requested = self.context.get("fields")
+        return tuple(
+            field for field in self.Meta.fields
+            if requested is None or field in requested
+        )
+
+    def load_flags(self, cards):
+        request = self.context.get("request")
+        user = request.user if request else None
+        self.flags = {"favorited": set(), "in_cart": set(), "following": set()}
+        if not user or not user.is_authenticated or not cards:
+            return
+        recipe_ids = [card.pk for card in cards]
+        if "is_favorited" in self.output_fields:
+            self.flags["favorited"] = set(Favorite.objects.filter(
+                user=user, recipe_id__in=recipe_ids
+            ).values_list("recipe_id", flat=True))
+        if "is_in_shopping_cart" in self.output_fields:
+            self.flags["in_cart"] = set(ShoppingCart.objects.filter(
+                user=user, recipe_id__in=recipe_ids
+            ).values_list("recipe_id", flat=True))
+        if "author" in self.output_fields and is_expanded(
+            self.context, "author"
+        ):
+            self.flags["following"] = graph.following(user.pk)
+
+    def to_representation(self, card):
+        if self.flags is None:
+            self.load_flags([card])
+        data = {"id": card.pk}
+        for field in self.output_fields:
+            if field == "id":
+                continue
+            if field in self.Meta.card_fields:
+                data[field] = card.card[field]
+            elif field in self.Meta.detail_fields:
+                data[field] = card.detail[field]
+        data.update(self.represent_relations(card, data))
+        request = self.context.get("request")
+        if data.get("image") and request:
+            data["image"] = request.build_absolute_uri(data["image"])
+        if "is_favorited" in self.output_fields:
+            data["is_favorited"] = card.pk in self.flags["favorited"]
+        if "is_in_shopping_cart" in self.output_fields:
+            data["is_in_shopping_cart"] = card.pk in self.flags["in_cart"]
+        return {field: data[field] for field in self.output_fields}
+
+    def represent_relations(self, card, data):
+        if "author" in data:
+            if is_expanded(self.context, "author"):
+                yield "author", dict(
+                    data["author"],
+                    is_subscribed=card.author_id in self.flags["following"],
+                )
+            else:
+                yield "author", card.author_id
+        if "tags" in data and not is_expanded(self.context, "tags"):
+            yield "tags", [tag["id"] for tag in data["tags"]]
+        if "ingredients" in data and not is_expanded(
+            self.context, "ingredients"
+        ):
+            yield "ingredients", [
+                {"id": row["id"], "amount": row["amount"]}
+                for row in data["ingredients"]
+            ]
+
+
 class SmallRecipeSerializer(serializers.ModelSerializer):
     image = Base64ImageField(max_length=None)
 
@@ -267,7 +413,7 @@ class FollowSerializer(CustomUserSerializer):
         if not request:
             return False
         user = request.user
-        if Follow.objects.filter(following=following, user=user).exists():
+        if graph.is_following(user.pk, following.pk):
             raise serializers.ValidationError(
                 "You are already subscribed to this user",
                 code=status.HTTP_400_BAD_REQUEST,
@@ -279,15 +425,19 @@ class FollowSerializer(CustomUserSerializer):
         return data
 
     def get_recipes_count(self, obj):
+        if hasattr(obj, "recipes_count"):
+            return obj.recipes_count
         return obj.recipes.count()
 
     def get_recipes(self, obj):
         request = self.context.get("request")
         if not request:
             return False
-        limit = request.GET.get("recipes_limit")
+        limit = recipes_limit(request)
         recipes = obj.recipes.all()
-        if limit:
-            recipes = recipes[: int(limit)]
+        if limit is not None:
+            recipes = recipes[:limit]
+        if not is_expanded(self.context, "recipes"):
+            return [recipe.id for recipe in recipes]
         serializer = SmallRecipeSerializer(recipes, many=True, read_only=True)
         return serializer.data
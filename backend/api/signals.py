@@ -0,0 +1,80 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from recipes.models import Ingredient, Recipe, Tag
+from rest_framework.authtoken.models import Token
+
+from . import cards, invalidation
+from .cards import refresh_cards
+
+User = get_user_model()
+
+AUTHOR_FIELDS = {"email", "username", "first_name", "last_name"}
+
+
+@receiver(post_save, sender=Tag)
+def refresh_tag_cards(sender, instance, created, **kwargs):
+    if not created:
+        refresh_cards(
+            Recipe.objects.filter(tags=instance), fresh_dimensions=True
+        )
+
+
+@receiver(post_save, sender=Ingredient)
+def refresh_ingredient_cards(sender, instance, created, **kwargs):
+    if not created:
+        refresh_cards(
+            Recipe.objects.filter(ingredients=instance), fresh_dimensions=True
+        )
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def remember_affected_recipes(sender, instance, **kwargs):
+    lookup = "tags" if sender is Tag else "ingredients"
+    instance._card_recipe_ids = list(
+        Recipe.objects.filter(**{lookup: instance}).values_list(
+            "pk", flat=True
+        )
+    )
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def refresh_affected_cards(sender, instance, **kwargs):
+    recipe_ids = getattr(instance, "_card_recipe_ids", None)
+    if recipe_ids:
+        refresh_cards(
+            Recipe.objects.filter(pk__in=recipe_ids), fresh_dimensions=True
+        )
+
+
+@receiver(post_save, sender=User)
+def refresh_author_cards(sender, instance, created, update_fields, **kwargs):
+    if created:
+        return
+    fields = AUTHOR_FIELDS & set(update_fields or AUTHOR_FIELDS)
+    if instance.changed_fields(fields):
+        refresh_cards(Recipe.objects.filter(author=instance))
+
+
+@receiver(post_delete, sender=Recipe)
+def invalidate_deleted_card(sender, instance, **kwargs):
+    cards.invalidate()
+
+
+# Only the models of invalidation.on_change handlers, every message is
+# a NOTIFY in the writing transaction.
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_delete, sender=User)
+def publish_invalidation(sender, instance, **kwargs):
+    invalidation.publish(sender._meta.model_name, instance.pk)
+
+
+@receiver(post_delete, sender=Token)
+def publish_token_invalidation(sender, instance, **kwargs):
+    invalidation.publish("user", instance.user_id)
@@ -0,0 +1,99 @@
+"""Rate limits of the expensive endpoints, shared by every worker.
+
+Views map their actions to a scope in throttle_scopes. A scope is
+limited per user, per IP for anonymous clients, by the scope rate of
+DEFAULT_THROTTLE_RATES and per IP by the "<scope>_ip" rate. The
+THROTTLING setting is read on every request, so the measuring commands
+can turn the limits off with override_settings.
+"""
+from time import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class BucketThrottle(SimpleRateThrottle):
+    """Counts the requests of the current window plus the share of the
+    previous window still within the last period, so the allowance
+    refills continuously like a bucket of num_requests tokens. Counters
+    only change with cache.incr and cache.decr, concurrent workers do
+    not overwrite each other's requests."""
+
+    cache = cache
+    timer = time
+    scope_suffix = ""
+
+    def __init__(self):
+        """The scope depends on the action, it is set in allow_request."""
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = f"user:{request.user.pk}"
+        else:
+            ident = f"ip:{self.get_ident(request)}"
+        return f"throttle:{self.scope}:{ident}"
+
+    def allow_request(self, request, view):
+        scope = getattr(view, "throttle_scopes", {}).get(
+            getattr(view, "action", None)
+        )
+        if scope is None or not settings.THROTTLING:
+            return True
+        self.scope = scope + self.scope_suffix
+        self.rate = self.get_rate()
+        if self.rate is None:
+            return True
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        key = self.get_cache_key(request, view)
+
+        now = self.timer()
+        window = int(now // self.duration)
+        self.elapsed = now - window * self.duration
+        current = f"{key}:{window}"
+        self.cache.add(current, 0, self.duration * 2)
+        try:
+            self.count = self.cache.incr(current)
+        except ValueError:
+            self.cache.add(current, 1, self.duration * 2)
+            self.count = 1
+        self.previous = self.cache.get(f"{key}:{window - 1}", 0)
+        used = self.count + self.previous * (1 - self.elapsed / self.duration)
+        allowed = used <= self.num_requests
+        if not allowed:
+            self.cache.decr(current)
+            self.count -= 1
+            used -= 1
+        self.add_headers(view, max(int(self.num_requests - used), 0))
+        return allowed
+
+    def add_headers(self, view, remaining):
+        """Rate limit headers of the most restrictive bucket."""
+        current = view.headers.get("X-RateLimit-Remaining")
+        if current is not None and int(current) < remaining:
+            return
+        view.headers["X-RateLimit-Limit"] = str(self.num_requests)
+        view.headers["X-RateLimit-Remaining"] = str(remaining)
+        view.headers["X-RateLimit-Reset"] = str(
+            int(self.duration - self.elapsed) + 1
+        )
+
+    def wait(self):
+        """Seconds until the previous window weighs little enough."""
+        if self.previous and self.count < self.num_requests:
+            weight = (self.num_requests - self.count) / self.previous
+            return max((1 - weight) * self.duration - self.elapsed, 1)
+        return self.duration - self.elapsed + self.duration * max(
+            1 - self.num_requests / max(self.count, 1), 0
+        )
+
+
+class UserBucketThrottle(BucketThrottle):
+    pass
+
+
+class IPBucketThrottle(BucketThrottle):
+    scope_suffix = "_ip"
+
+    def get_cache_key(self, request, view):
+        return f"throttle:{self.scope}:ip:{self.get_ident(request)}"
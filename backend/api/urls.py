@@ -1,6 +1,7 @@
 from django.urls import include, path
 from rest_framework import routers
 
+from .asynchronous import async_patterns
 from .views import IngredientViewSet, RecipeViewSet, TagViewSet
 
 app_name = "api"
@@ -12,5 +13,5 @@ router.register("ingredients", IngredientViewSet, basename="ingredients"),
 
 
 urlpatterns = [
-    path("", include(router.urls)),
+    path("", include(async_patterns(router.urls, ("list", "retrieve")))),
 ]
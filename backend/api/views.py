@@ -1,41 +1,118 @@
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from django.db.models import Sum
-from django.http import Http404, HttpResponse
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
-from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
+from recipes import dimensions
+from recipes.deletion import delete_recipes
+from recipes.models import (CatalogChange, Favorite, Ingredient,
+                            IngredientInRecipe, Recipe, RecipeCard,
                             ShoppingCart, Tag)
+from recipes.transfer import export_recipes
 from rest_framework import serializers, status, viewsets
 from rest_framework.decorators import action
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import (AllowAny, IsAdminUser,
+                                        IsAuthenticated)
 from rest_framework.response import Response
 from rest_framework.viewsets import ReadOnlyModelViewSet
 
+from . import cards
+from .cards import refresh_cards
+from .events import publish
 from .filters import IngredientSearchFilter, RecipeFilter
+from .mixins import (BatchRetrieveMixin, CatalogSnapshotMixin,
+                     SharedCacheMixin, SparseFieldsetMixin)
 from .pagination import CustomPagination
 from .permissions import AuthorOrAdminOrReadOnly
-from .serializers import (IngredientSerializer, RecipeListSerializer,
+from .serializers import (IngredientSerializer, RecipeCardSerializer,
                           RecipeSerializer, SmallRecipeSerializer,
                           TagSerializer)
 
 User = get_user_model()
 
+EVENT_TYPES = {Favorite: "favorite", ShoppingCart: "shopping_cart"}
 
-class RecipeViewSet(viewsets.ModelViewSet):
-    """CRUD for recipes."""
 
+class RecipeViewSet(
+    BatchRetrieveMixin, SparseFieldsetMixin, SharedCacheMixin,
+    viewsets.ModelViewSet,
+):
+    """CRUD for recipes, reads are served from the recipe cards."""
+
+    read_actions = ("list", "retrieve")
+    uncached_params = ("is_favorited", "is_in_shopping_cart")
+    expandable = RecipeCardSerializer.Meta.expandable
     queryset = Recipe.objects.all()
     permission_classes = (AuthorOrAdminOrReadOnly,)
     pagination_class = CustomPagination
     filterset_class = RecipeFilter
     filter_backends = (DjangoFilterBackend,)
-
+    throttle_scopes = {
+        "create": "uploads",
+        "update": "uploads",
+        "partial_update": "uploads",
+        "favorite": "writes",
+        "shopping_cart": "writes",
+        "download_shopping_cart": "downloads",
+    }
+
+    def get_queryset(self):
+        if self.action in self.read_actions:
+            return self.get_card_queryset()
+        return super().get_queryset()
+
+    def cache_version(self):
+        return cards.get_version()
+
+    def get_card_queryset(self):
+        """Leaves out the card columns the requested fields do not use."""
+        cards.repair_missing()
+        queryset = RecipeCard.objects.all()
+        fields, _ = self.get_fieldset()
+        if fields is None:
+            return queryset
+        meta = RecipeCardSerializer.Meta
+        if not fields & set(meta.detail_fields):
+            queryset = queryset.defer("detail")
+        if not fields & (set(meta.card_fields) - {"id"}):
+            queryset = queryset.defer("card")
+        return queryset
+
+    def get_object(self):
+        try:
+            return super().get_object()
+        except Http404:
+            pk = str(self.kwargs["pk"])
+            if self.action not in self.read_actions or not (
+                pk.isdigit() and cards.build_missing(
+                    Recipe.objects.filter(pk=pk)
+                )
+            ):
+                raise
+        return super().get_object()
+
+    def filter_queryset(self, queryset):
+        if self.action in self.read_actions:
+            return super().filter_queryset(queryset)
+        return queryset
+
+    @transaction.atomic
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        recipe = serializer.save(author=self.request.user)
+        refresh_cards(Recipe.objects.filter(pk=recipe.pk))
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        recipe = serializer.save()
+        refresh_cards(Recipe.objects.filter(pk=recipe.pk))
+
+    def perform_destroy(self, instance):
+        delete_recipes(Recipe.objects.filter(pk=instance.pk))
 
     def get_serializer_class(self):
-        if self.request.method == "GET":
-            return RecipeListSerializer
+        if self.action in self.read_actions:
+            return RecipeCardSerializer
         return RecipeSerializer
 
     @action(
@@ -69,6 +146,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
         except Exception:
             raise serializers.ValidationError("The recipe does not exist")
         model.objects.create(user=user, recipe=recipe)
+        publish(user.pk, EVENT_TYPES[model], recipe.pk, True)
         serializer = SmallRecipeSerializer(recipe)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
@@ -80,6 +158,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
         obj = model.objects.filter(user=user, recipe__id=pk)
         if obj.exists():
             obj.delete()
+            publish(user.pk, EVENT_TYPES[model], int(pk), False)
             return Response(status=status.HTTP_204_NO_CONTENT)
         return Response(
             {"error": "The recipe is already deleted"},
@@ -113,19 +192,45 @@ class RecipeViewSet(viewsets.ModelViewSet):
         response["Content-Disposition"] = f"attachment; filename={file}"
         return response
 
+    @action(detail=False, methods=["get"], permission_classes=[IsAdminUser])
+    def export(self, request):
+        """Streams every recipe, or those of ?author=<id>, as NDJSON."""
+        recipes = Recipe.objects.all()
+        author = request.query_params.get("author")
+        if author:
+            recipes = recipes.filter(author_id=author)
+        response = StreamingHttpResponse(
+            export_recipes(recipes), content_type="application/x-ndjson"
+        )
+        response["Content-Disposition"] = "attachment; filename=recipes.ndjson"
+        return response
+
 
-class IngredientViewSet(ReadOnlyModelViewSet):
+class IngredientViewSet(
+    BatchRetrieveMixin, CatalogSnapshotMixin, SharedCacheMixin,
+    ReadOnlyModelViewSet,
+):
     """List of the ingredients."""
 
+    catalog = CatalogChange.INGREDIENTS
     queryset = Ingredient.objects.all()
     permission_classes = (AllowAny,)
     serializer_class = IngredientSerializer
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientSearchFilter
 
+    def cache_version(self):
+        return dimensions.get_version()
 
-class TagViewSet(ReadOnlyModelViewSet):
+
+class TagViewSet(
+    CatalogSnapshotMixin, SharedCacheMixin, ReadOnlyModelViewSet
+):
     """Tags representation."""
 
+    catalog = CatalogChange.TAGS
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
+
+    def cache_version(self):
+        return dimensions.get_version()
@@ -0,0 +1,72 @@
+from hashlib import sha256
+
+from asgiref.sync import (iscoroutinefunction, markcoroutinefunction,
+                          sync_to_async)
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.permissions import SAFE_METHODS
+
+from .routers import choose_replica, read_database
+
+
+def pin_key(request):
+    """Cache key of the client's credentials, None for anonymous ones."""
+    credentials = request.META.get("HTTP_AUTHORIZATION") or (
+        request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    )
+    if not credentials:
+        return None
+    return "replica-pin:" + sha256(credentials.encode()).hexdigest()
+
+
+class ReplicaMiddleware:
+    """Serves safe API requests from a replica, except for clients that
+    wrote within REPLICA_PIN_SECONDS, so they read their own writes."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.REPLICA_DATABASES:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def choose_database(self, request, key):
+        if (
+            request.method in SAFE_METHODS
+            and request.path.startswith("/api/")
+            and not (key and cache.get(key))
+        ):
+            return choose_replica()
+        return DEFAULT_DB_ALIAS
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        key = pin_key(request)
+        token = read_database.set(self.choose_database(request, key))
+        try:
+            response = self.get_response(request)
+        finally:
+            read_database.reset(token)
+        if request.method not in SAFE_METHODS and key:
+            cache.set(key, True, settings.REPLICA_PIN_SECONDS)
+        return response
+
+    async def __acall__(self, request):
+        key = pin_key(request)
+        database = await sync_to_async(self.choose_database)(request, key)
+        token = read_database.set(database)
+        try:
+            response = await self.get_response(request)
+        finally:
+            read_database.reset(token)
+        if request.method not in SAFE_METHODS and key:
+            await sync_to_async(cache.set)(
+                key, True, settings.REPLICA_PIN_SECONDS
+            )
+        return response
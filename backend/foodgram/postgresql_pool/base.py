@@ -0,0 +1,163 @@
+"""PostgreSQL backend that takes connections from a per-process pool.
+
+Closing the Django connection, after every request with CONN_MAX_AGE 0,
+returns it to the pool instead of closing the socket. The pool is set up
+by the POOL dict of the database settings: MAX_SIZE open connections at
+most, TIMEOUT seconds to wait for one, and connections idle for longer
+than CHECK_INTERVAL seconds are checked with a query before reuse.
+"""
+import os
+import threading
+from time import monotonic, perf_counter
+
+import psycopg2
+import psycopg2.extensions
+import psycopg2.extras
+from django.db import OperationalError
+from django.db.backends.postgresql import base
+from django.utils.asyncio import async_unsafe
+from monitoring.metrics import (DB_POOL_CONNECTIONS, DB_POOL_DISCARDED,
+                                DB_POOL_TIMEOUTS, DB_POOL_WAIT)
+
+POOL_DEFAULTS = {"MAX_SIZE": 8, "TIMEOUT": 10, "CHECK_INTERVAL": 30}
+
+
+class ConnectionPool:
+    def __init__(self, alias, conn_params, options):
+        self.alias = alias
+        self.conn_params = conn_params
+        self.max_size = options["MAX_SIZE"]
+        self.timeout = options["TIMEOUT"]
+        self.check_interval = options["CHECK_INTERVAL"]
+        self.condition = threading.Condition()
+        self.idle = []
+        self.size = 0
+
+    def report(self):
+        DB_POOL_CONNECTIONS.labels(self.alias, "idle").set(len(self.idle))
+        DB_POOL_CONNECTIONS.labels(self.alias, "in_use").set(
+            self.size - len(self.idle)
+        )
+
+    def checkout(self):
+        """An idle connection, a new one while the pool is not full,
+        otherwise waits up to TIMEOUT seconds for one to be returned."""
+        start = perf_counter()
+        deadline = monotonic() + self.timeout
+        connection = returned_at = None
+        with self.condition:
+            while not self.idle and self.size >= self.max_size:
+                remaining = deadline - monotonic()
+                if remaining <= 0:
+                    DB_POOL_TIMEOUTS.labels(self.alias).inc()
+                    raise OperationalError(
+                        f"No free connection in the {self.alias} pool "
+                        f"of {self.max_size} after {self.timeout}s."
+                    )
+                self.condition.wait(remaining)
+            if self.idle:
+                connection, returned_at = self.idle.pop()
+            else:
+                self.size += 1
+            self.report()
+        DB_POOL_WAIT.labels(self.alias).observe(perf_counter() - start)
+
+        if connection is not None and not self.is_healthy(
+            connection, returned_at
+        ):
+            DB_POOL_DISCARDED.labels(self.alias).inc()
+            connection.close()
+            connection = None
+        if connection is None:
+            try:
+                connection = psycopg2.connect(**self.conn_params)
+            except Exception:
+                with self.condition:
+                    self.size -= 1
+                    self.report()
+                    self.condition.notify()
+                raise
+        return connection
+
+    def is_healthy(self, connection, returned_at):
+        if connection.closed:
+            return False
+        if monotonic() - returned_at < self.check_interval:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            connection.rollback()
+        except psycopg2.Error:
+            return False
+        return True
+
+    def checkin(self, connection):
+        """Takes the connection back, rolled back to an idle state,
+        broken connections are closed and free their slot."""
+        if not connection.closed:
+            status = connection.info.transaction_status
+            try:
+                if status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+                    connection.close()
+                elif status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    connection.rollback()
+            except psycopg2.Error:
+                connection.close()
+        with self.condition:
+            if connection.closed:
+                DB_POOL_DISCARDED.labels(self.alias).inc()
+                self.size -= 1
+            else:
+                self.idle.append((connection, monotonic()))
+            self.report()
+            self.condition.notify()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, conn_params, options):
+    """Pool of the alias in this process, workers forked from a
+    preloaded master do not share the connections of their parent."""
+    key = (os.getpid(), alias)
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = _pools[key] = ConnectionPool(
+                    alias, conn_params, {**POOL_DEFAULTS, **options}
+                )
+    return pool
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_pool(self, conn_params=None):
+        return get_pool(
+            self.alias,
+            conn_params or self.get_connection_params(),
+            self.settings_dict.get("POOL", {}),
+        )
+
+    @async_unsafe
+    def get_new_connection(self, conn_params):
+        connection = self.get_pool(conn_params).checkout()
+        options = self.settings_dict["OPTIONS"]
+        try:
+            self.isolation_level = options["isolation_level"]
+        except KeyError:
+            self.isolation_level = connection.isolation_level
+        else:
+            if self.isolation_level != connection.isolation_level:
+                connection.set_session(isolation_level=self.isolation_level)
+        psycopg2.extras.register_default_jsonb(
+            conn_or_curs=connection, loads=lambda x: x
+        )
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.get_pool().checkin(self.connection)
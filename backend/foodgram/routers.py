@@ -0,0 +1,103 @@
+import logging
+import random
+import threading
+from contextvars import ContextVar
+from time import monotonic
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger("foodgram.replicas")
+
+read_database = ContextVar("read_database", default=DEFAULT_DB_ALIAS)
+
+# Read right after the write that created them, e.g. the token of a login.
+PRIMARY_MODELS = {"authtoken.token"}
+
+# The last replay gets older while the primary is idle, a replica that
+# has replayed all it received is not behind.
+LAG_SQL = (
+    "SELECT CASE WHEN NOT pg_is_in_recovery() "
+    "OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH "
+    "FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+class ReplicaHealth:
+    """Replicas that answer and lag behind the primary by at most
+    REPLICA_MAX_LAG seconds, rechecked every REPLICA_CHECK_INTERVAL."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checked_at = None
+        self.healthy = []
+
+    def lag(self, alias):
+        connection = connections[alias]
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                cursor.execute(LAG_SQL)
+            else:
+                cursor.execute("SELECT 0")
+            return float(cursor.fetchone()[0])
+
+    def check(self, alias):
+        try:
+            lag = self.lag(alias)
+        except DatabaseError as error:
+            logger.warning("replica %s is unavailable: %s", alias, error)
+            return False
+        if lag > settings.REPLICA_MAX_LAG:
+            logger.warning("replica %s lags by %.1fs", alias, lag)
+            return False
+        return True
+
+    def available(self):
+        """Healthy replicas, a single thread rechecks them when
+        the last check is too old while the others go on."""
+        stale = (
+            self.checked_at is None
+            or monotonic() - self.checked_at >= settings.REPLICA_CHECK_INTERVAL
+        )
+        if stale and self.lock.acquire(blocking=False):
+            try:
+                self.healthy = [
+                    alias for alias in settings.REPLICA_DATABASES
+                    if self.check(alias)
+                ]
+                self.checked_at = monotonic()
+            finally:
+                self.lock.release()
+        return self.healthy
+
+
+health = ReplicaHealth()
+
+
+def choose_replica():
+    """A random healthy replica, the primary when there is none."""
+    replicas = health.available()
+    return random.choice(replicas) if replicas else DEFAULT_DB_ALIAS
+
+
+class ReplicaRouter:
+    """Sends reads to the database ReplicaMiddleware chose for the
+    request, the primary by default, and all writes to the primary."""
+
+    def db_for_read(self, model, **hints):
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        if model._meta.label_lower in PRIMARY_MODELS:
+            return DEFAULT_DB_ALIAS
+        return read_database.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
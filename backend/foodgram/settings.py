@@ -31,10 +31,15 @@ INSTALLED_APPS = [
     "api",
     "recipes",
     "users",
+    "monitoring",
 ]
 
 
 MIDDLEWARE = [
+    "monitoring.middleware.MetricsMiddleware",
+    "monitoring.middleware.QueryDiagnosticsMiddleware",
+    "monitoring.middleware.ProfilingMiddleware",
+    "foodgram.middleware.ReplicaMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -68,17 +73,57 @@ WSGI_APPLICATION = "foodgram.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
+DB_POOL = os.getenv("DB_POOL", "True") == "True"
+
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.postgresql",
+        "ENGINE": (
+            "foodgram.postgresql_pool" if DB_POOL
+            else "django.db.backends.postgresql"
+        ),
         "NAME": os.getenv("POSTGRES_DB", "django"),
         "USER": os.getenv("POSTGRES_USER", "django"),
         "PASSWORD": os.getenv("POSTGRES_PASSWORD", ""),
         "HOST": os.getenv("DB_HOST", ""),
         "PORT": os.getenv("DB_PORT", 5432),
+        # Pooled connections go back to the pool after every request.
+        # Every gunicorn worker has a pool of its own, GUNICORN_WORKERS
+        # * DB_POOL_MAX_SIZE of all the backend containers must stay
+        # below max_connections of postgres, 100 by default.
+        "CONN_MAX_AGE": 0 if DB_POOL else int(os.getenv("CONN_MAX_AGE", 60)),
+        "POOL": {
+            "MAX_SIZE": int(os.getenv("DB_POOL_MAX_SIZE", 8)),
+            "TIMEOUT": float(os.getenv("DB_POOL_TIMEOUT", 10)),
+            "CHECK_INTERVAL": float(os.getenv("DB_POOL_CHECK_INTERVAL", 30)),
+        },
     }
 }
 
+for number, host in enumerate(
+    filter(None, os.getenv("DB_REPLICA_HOSTS", "").split(","))
+):
+    DATABASES[f"replica_{number}"] = {
+        **DATABASES["default"],
+        "HOST": host,
+        "OPTIONS": {"connect_timeout": 2},
+        "TEST": {"MIRROR": "default"},
+    }
+
+DATABASE_ROUTERS = ["foodgram.routers.ReplicaRouter"]
+REPLICA_DATABASES = [alias for alias in DATABASES if alias != "default"]
+REPLICA_PIN_SECONDS = int(os.getenv("REPLICA_PIN_SECONDS", 10))
+REPLICA_MAX_LAG = float(os.getenv("REPLICA_MAX_LAG", 5))
+REPLICA_CHECK_INTERVAL = float(os.getenv("REPLICA_CHECK_INTERVAL", 10))
+
+
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.getenv("CACHE_LOCATION", ""),
+    }
+}
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -120,17 +165,100 @@ MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 
 CSV_FILES_DIR = os.path.join(BASE_DIR, "data")
+DATA_DIR = os.getenv("DATA_DIR", BASE_DIR.parent / "data")
+
+
+QUERY_DIAGNOSTICS = os.getenv("QUERY_DIAGNOSTICS", "False") == "True"
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 100))
+REPEATED_QUERY_THRESHOLD = int(os.getenv("REPEATED_QUERY_THRESHOLD", 5))
+
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "True") == "True"
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", 0))
+PROFILING_INTERVAL = float(os.getenv("PROFILING_INTERVAL", 0.001))
+PROFILING_TOKEN_MAX_AGE = 60 * 60
+PROFILING_DIR = os.getenv("PROFILING_DIR", BASE_DIR / "profiles")
+PROFILING_MAX_FILES = int(os.getenv("PROFILING_MAX_FILES", 200))
 
+INTERNAL_IPS = os.getenv("INTERNAL_IPS", "127.0.0.1").split(",")
+
+# Seconds a replaced catalog snapshot stays available to the clients
+# that still hold the previous manifest.
+CATALOG_SNAPSHOT_GRACE = int(os.getenv("CATALOG_SNAPSHOT_GRACE", 60 * 60))
+
+THROTTLING = os.getenv("THROTTLING", "True") == "True"
 
 REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.AllowAny",
     ],
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework.authentication.TokenAuthentication",
+        "api.authentication.CachedTokenAuthentication",
+    ],
+    "DEFAULT_RENDERER_CLASSES": [
+        "monitoring.renderers.TimedJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
     ],
+    # Counters live in the default cache, set CACHE_BACKEND to a shared
+    # one so that the limits hold across workers.
+    # THROTTLING=False turns them off, for load tests of a server.
+    "DEFAULT_THROTTLE_CLASSES": [
+        "api.throttles.UserBucketThrottle",
+        "api.throttles.IPBucketThrottle",
+    ],
+    "DEFAULT_THROTTLE_RATES": {
+        "writes": os.getenv("THROTTLE_WRITES", "60/min"),
+        "writes_ip": os.getenv("THROTTLE_WRITES_IP", "300/min"),
+        "uploads": os.getenv("THROTTLE_UPLOADS", "30/hour"),
+        "uploads_ip": os.getenv("THROTTLE_UPLOADS_IP", "100/hour"),
+        "downloads": os.getenv("THROTTLE_DOWNLOADS", "10/min"),
+        "downloads_ip": os.getenv("THROTTLE_DOWNLOADS_IP", "30/min"),
+    },
+    # nginx sets X-Forwarded-For to the client address.
+    "NUM_PROXIES": 1,
 }
 
+# Set by foodgram.asgi, serves the hot read endpoints from async views.
+ASYNC_READ_VIEWS = os.getenv("ASYNC_READ_VIEWS", "False") == "True"
+ASYNC_DB_WORKERS = int(os.getenv("ASYNC_DB_WORKERS", 8))
+
+# The event stream needs SERVER_MODE=asgi. LocalBroker reaches the
+# streams of its own process only, use api.events.PostgresBroker with
+# several workers or WSGI writes.
+EVENTS_BROKER = os.getenv("EVENTS_BROKER", "api.events.LocalBroker")
+EVENTS_HEARTBEAT = 15
+EVENTS_TICKET_TIMEOUT = 30
+
+# Recipes written without a card, by bulk or raw paths, get one within
+# this many seconds of a recipe read.
+CARD_REPAIR_INTERVAL = int(os.getenv("CARD_REPAIR_INTERVAL", 60))
+
+# Seconds the cached recipe, tag and ingredient reads stay fresh, and
+# how long after that a stale copy is served while one request refreshes
+# it. 0 turns the read cache off.
+READ_CACHE_TIMEOUT = int(os.getenv("READ_CACHE_TIMEOUT", 30))
+READ_CACHE_STALE = int(os.getenv("READ_CACHE_STALE", 300))
+READ_CACHE_WAIT = 2
+
+# api.invalidation.LocalBus evicts the in-memory caches of the process
+# making a change only, the others keep checking the shared versions.
+# api.invalidation.PostgresBus reaches every process with NOTIFY.
+INVALIDATION_BUS = os.getenv(
+    "INVALIDATION_BUS", "api.invalidation.LocalBus"
+)
+# Tokens kept in memory per process, used while the bus is listening.
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", 10000))
+TOKEN_CACHE_TIMEOUT = int(os.getenv("TOKEN_CACHE_TIMEOUT", 5 * 60))
+
+FOLLOW_GRAPH_TIMEOUT = int(os.getenv("FOLLOW_GRAPH_TIMEOUT", 60 * 60))
+
+BATCH_IDS_MAX = int(os.getenv("BATCH_IDS_MAX", 100))
+
+# Rows per transaction of the user purges and media cleanup.
+DELETION_BATCH_SIZE = int(os.getenv("DELETION_BATCH_SIZE", 500))
+
+# Admin changelists larger than this show the planner's row estimate.
+ADMIN_EXACT_COUNT_LIMIT = int(os.getenv("ADMIN_EXACT_COUNT_LIMIT", 10000))
+
 DJOSER = {
     "LOGIN_FIELD": "email",
     "SERIALIZERS": {
@@ -154,6 +282,15 @@ LOGGING = {
         "console": {
             "class": "logging.StreamHandler",
         },
+        "diagnostics": {
+            "class": "logging.handlers.RotatingFileHandler",
+            "filename": os.getenv(
+                "DIAGNOSTICS_LOG", BASE_DIR / "diagnostics.log"
+            ),
+            "maxBytes": 10 * 1024 * 1024,
+            "backupCount": 5,
+            "delay": True,
+        },
     },
     "root": {
         "handlers": ["console"],
@@ -170,5 +307,10 @@ LOGGING = {
             "level": "INFO",
             "propagate": False,
         },
+        "foodgram.diagnostics": {
+            "handlers": ["diagnostics"],
+            "level": "INFO",
+            "propagate": False,
+        },
     },
 }
@@ -5,4 +5,5 @@ urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/", include("api.urls", namespace="api")),
     path("api/", include("users.urls", namespace="users")),
+    path("api/", include("monitoring.urls", namespace="monitoring")),
 ]
@@ -0,0 +1,46 @@
+import multiprocessing
+import os
+import shutil
+
+from prometheus_client import multiprocess
+
+bind = "0.0.0.0:8000"
+accesslog = "-"
+# Each worker serves GUNICORN_THREADS requests at a time, about one
+# process per cpu is enough.
+workers = int(os.getenv("GUNICORN_WORKERS", multiprocessing.cpu_count()))
+if os.getenv("SERVER_MODE") == "asgi":
+    # Async views query on ASYNC_DB_WORKERS executor threads per worker.
+    wsgi_app = "foodgram.asgi:application"
+    worker_class = "uvicorn.workers.UvicornWorker"
+else:
+    # Threads share a worker's database pool, DB_POOL_MAX_SIZE should be
+    # at least GUNICORN_THREADS.
+    wsgi_app = "foodgram.wsgi"
+    worker_class = "gthread"
+    threads = int(os.getenv("GUNICORN_THREADS", 4))
+preload_app = True
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 1000))
+max_requests_jitter = max_requests // 10
+
+
+def on_starting(server):
+    pool_size = int(os.getenv("DB_POOL_MAX_SIZE", 8))
+    max_connections = int(os.getenv("POSTGRES_MAX_CONNECTIONS", 100))
+    if (
+        os.getenv("DB_POOL", "True") == "True"
+        and workers * pool_size > max_connections
+    ):
+        server.log.warning(
+            "%d workers with DB_POOL_MAX_SIZE=%d may open more than the "
+            "%d connections of postgres", workers, pool_size, max_connections
+        )
+    metrics_dir = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if metrics_dir:
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+        os.makedirs(metrics_dir)
+
+
+def child_exit(server, worker):
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(worker.pid)
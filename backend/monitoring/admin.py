@@ -0,0 +1,16 @@
+from django.contrib import admin
+
+from .models import QueryReport
+
+
+@admin.register(QueryReport)
+class QueryReportAdmin(admin.ModelAdmin):
+    list_display = ("created", "kind", "route", "method", "count",
+                    "duration_ms")
+    list_filter = ("kind", "route")
+    search_fields = ("sql",)
+    readonly_fields = ("created", "kind", "route", "method", "sql", "count",
+                       "duration_ms", "plan")
+
+    def has_add_permission(self, request):
+        return False
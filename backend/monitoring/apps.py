@@ -0,0 +1,16 @@
+from django.apps import AppConfig
+
+
+class MonitoringConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "monitoring"
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from .diagnostics import install_query_recorder
+        from .metrics import install_sql_recorder, instrument_serializers
+
+        connection_created.connect(install_sql_recorder)
+        connection_created.connect(install_query_recorder)
+        instrument_serializers()
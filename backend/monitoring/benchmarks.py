@@ -0,0 +1,248 @@
+"""Micro-benchmarks of the serializer and aggregation hot paths.
+
+Every benchmark is a (name, setup) pair: setup receives the fixtures and
+returns the function that is timed. Fixtures are created by
+create_fixtures() with fixed sizes, so runs on any database compare.
+"""
+from statistics import median
+from time import perf_counter
+
+from api.cards import refresh_cards
+from api.serializers import (FollowSerializer, RecipeCardSerializer,
+                             RecipeListSerializer, RecipeSerializer)
+from api.views import RecipeViewSet
+from django.contrib.auth import get_user_model
+from django.db import connection
+from recipes.models import (Ingredient, IngredientInRecipe, Recipe,
+                            RecipeCard, ShoppingCart, Tag)
+from rest_framework.test import APIRequestFactory, force_authenticate
+from users.models import Follow
+
+User = get_user_model()
+
+RECIPE_COUNTS = (6, 50, 500)
+RECIPES_LIMITS = (None, 3, 10)
+INGREDIENT_COUNTS = (1, 10, 50, 100)
+CART_SIZES = (5, 20, 100)
+INGREDIENTS_PER_RECIPE = 8
+AUTHORS = 6
+
+
+class BenchmarkError(Exception):
+    """A benchmarked call failed, its timings would be meaningless."""
+
+
+def create_fixtures():
+    """Users, 500 recipes of 6 followed authors and 100 ingredients."""
+    reader = User.objects.create(
+        username="benchmark-reader", email="benchmark-reader@example.com"
+    )
+    User.objects.bulk_create(
+        User(username=f"benchmark-{number}",
+             email=f"benchmark-{number}@example.com")
+        for number in range(AUTHORS)
+    )
+    authors = list(User.objects.filter(username__startswith="benchmark-"))
+    authors.remove(reader)
+    Follow.objects.bulk_create(
+        Follow(user=reader, following=author) for author in authors
+    )
+    Tag.objects.bulk_create(
+        Tag(name=f"benchmark {number}", color="#000000",
+            slug=f"benchmark-{number}")
+        for number in range(3)
+    )
+    tags = list(Tag.objects.filter(slug__startswith="benchmark-"))
+    Ingredient.objects.bulk_create(
+        Ingredient(name=f"benchmark {number}", measurement_unit="г")
+        for number in range(max(INGREDIENT_COUNTS))
+    )
+    ingredients = list(
+        Ingredient.objects.filter(name__startswith="benchmark")
+    )
+    Recipe.objects.bulk_create(
+        Recipe(author=authors[number % AUTHORS], name=f"benchmark {number}",
+               text="text " * 50, cooking_time=10)
+        for number in range(max(RECIPE_COUNTS))
+    )
+    recipes = list(
+        Recipe.objects.filter(name__startswith="benchmark")
+        .select_related("author")
+    )
+    Recipe.tags.through.objects.bulk_create(
+        Recipe.tags.through(recipe=recipe, tag=tag)
+        for recipe in recipes for tag in tags[:2]
+    )
+    IngredientInRecipe.objects.bulk_create(
+        IngredientInRecipe(recipe=recipe, ingredient=ingredient, amount=10)
+        for number, recipe in enumerate(recipes)
+        for ingredient in (
+            ingredients[(number + offset) % len(ingredients)]
+            for offset in range(INGREDIENTS_PER_RECIPE)
+        )
+    )
+    refresh_cards(Recipe.objects.filter(pk__in=[r.pk for r in recipes]))
+    request = APIRequestFactory().get("/api/recipes/")
+    request.user = reader
+    return {
+        "reader": reader,
+        "recipes": recipes,
+        "ingredients": ingredients,
+        "request": request,
+    }
+
+
+def recipe_list(count):
+    def setup(fixtures):
+        recipes = fixtures["recipes"][:count]
+        context = {"request": fixtures["request"]}
+
+        def run():
+            for recipe in recipes:
+                recipe.__dict__.pop("_tag_ids", None)
+            return RecipeListSerializer(recipes, many=True,
+                                        context=context).data
+        return run
+    return setup
+
+
+def recipe_to_representation(count):
+    def setup(fixtures):
+        recipes = fixtures["recipes"][:count]
+        context = {"request": fixtures["request"]}
+        serializer = RecipeSerializer(context=context)
+
+        def run():
+            for recipe in recipes:
+                recipe.__dict__.pop("_tag_ids", None)
+                serializer.to_representation(recipe)
+        return run
+    return setup
+
+
+def recipe_cards(count):
+    def setup(fixtures):
+        cards = list(RecipeCard.objects.filter(
+            pk__in=[recipe.pk for recipe in fixtures["recipes"][:count]]
+        ))
+        context = {"request": fixtures["request"]}
+        return lambda: RecipeCardSerializer(
+            cards, many=True, context=context
+        ).data
+    return setup
+
+
+def follow(limit):
+    def setup(fixtures):
+        request = APIRequestFactory().get(
+            "/api/users/subscriptions/",
+            {"recipes_limit": limit} if limit else {},
+        )
+        request.user = fixtures["reader"]
+        authors = list(User.objects.filter(following__user=request.user))
+        context = {"request": request}
+        return lambda: FollowSerializer(
+            authors, many=True, context=context
+        ).data
+    return setup
+
+
+def validate_ingredients(count):
+    def setup(fixtures):
+        data = [
+            {"id": ingredient.pk, "amount": 10}
+            for ingredient in fixtures["ingredients"][:count]
+        ]
+        serializer = RecipeSerializer()
+        return lambda: serializer.validate_ingredients(data)
+    return setup
+
+
+def download_shopping_cart(size):
+    def setup(fixtures):
+        reader = fixtures["reader"]
+        ShoppingCart.objects.filter(user=reader).delete()
+        ShoppingCart.objects.bulk_create(
+            ShoppingCart(user=reader, recipe=recipe)
+            for recipe in fixtures["recipes"][:size]
+        )
+        view = RecipeViewSet.as_view({"get": "download_shopping_cart"})
+        factory = APIRequestFactory()
+
+        def run():
+            request = factory.get("/api/recipes/download_shopping_cart/")
+            force_authenticate(request, user=reader)
+            response = view(request)
+            if hasattr(response, "render"):
+                response.render()
+            if response.status_code != 200:
+                raise BenchmarkError(
+                    f"download_shopping_cart returned {response.status_code}"
+                )
+            return response.content
+        return run
+    return setup
+
+
+BENCHMARKS = (
+    [(f"recipe_list_serializer[{n}]", recipe_list(n))
+     for n in RECIPE_COUNTS]
+    + [(f"recipe_serializer_to_representation[{n}]",
+        recipe_to_representation(n)) for n in RECIPE_COUNTS]
+    + [(f"recipe_card_serializer[{n}]", recipe_cards(n))
+       for n in RECIPE_COUNTS]
+    + [(f"follow_serializer[recipes_limit={limit}]", follow(limit))
+       for limit in RECIPES_LIMITS]
+    + [(f"validate_ingredients[{n}]", validate_ingredients(n))
+       for n in INGREDIENT_COUNTS]
+    + [(f"download_shopping_cart[{n}]", download_shopping_cart(n))
+       for n in CART_SIZES]
+)
+
+
+def measure(run, repeat):
+    """Times run() after a first call, which fails before any timing
+    is recorded when the benchmarked call does not succeed."""
+    run()
+    queries = []
+
+    def count(execute, sql, params, many, context):
+        queries.append(sql)
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(count):
+        run()
+    times = []
+    for _ in range(repeat):
+        start = perf_counter()
+        run()
+        times.append((perf_counter() - start) * 1000)
+    return {
+        "median_ms": round(median(times), 3),
+        "min_ms": round(min(times), 3),
+        "runs": repeat,
+        "queries": len(queries),
+    }
+
+
+def run_benchmarks(repeat, selected=None):
+    fixtures = create_fixtures()
+    return {
+        name: measure(setup(fixtures), repeat)
+        for name, setup in BENCHMARKS
+        if not selected or any(part in name for part in selected)
+    }
+
+
+def compare(base, current):
+    """Rows of (name, base median, current median, current / base)."""
+    return [
+        (
+            name,
+            base[name]["median_ms"],
+            result["median_ms"],
+            result["median_ms"] / base[name]["median_ms"]
+            if base[name]["median_ms"] else float("inf"),
+        )
+        for name, result in current.items() if name in base
+    ]
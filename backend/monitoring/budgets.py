@@ -0,0 +1,110 @@
+from collections import namedtuple
+
+Budget = namedtuple(
+    "Budget",
+    ("name", "method", "url", "auth", "queries", "ms", "data"),
+    defaults=(None,),
+)
+
+PIXEL = (
+    "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAA"
+    "DUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg=="
+)
+RECIPE = {
+    "name": "Query budget recipe",
+    "text": "text",
+    "cooking_time": 10,
+    "image": PIXEL,
+    "tags": ["{tag}"],
+    "ingredients": [{"id": "{ingredient}", "amount": 10}],
+}
+
+# Maximum number of queries of every endpoint of api/urls.py and
+# users/urls.py on the generate_dataset data. The milliseconds are
+# generous limits for a developer machine, shared CI runners vary too
+# much, so check_query_budget fails on them only with --enforce-ms.
+BUDGETS = (
+    Budget("recipes-list", "get", "/api/recipes/", False, 2, 300),
+    Budget("recipes-list", "get", "/api/recipes/", True, 6, 300),
+    Budget("recipes-list", "get", "/api/recipes/?tags={tag_slug}", True, 6,
+           300),
+    Budget("recipes-list", "get", "/api/recipes/?is_favorited=1", True, 6,
+           300),
+    Budget("recipes-list", "get", "/api/recipes/?is_in_shopping_cart=1",
+           True, 6, 300),
+    Budget("recipes-list", "get", "/api/recipes/?author={author}", True, 7,
+           300),
+    Budget("recipes-list", "post", "/api/recipes/", True, 23, 500, RECIPE),
+    Budget("recipes-detail", "get", "/api/recipes/{recipe}/", True, 5, 200),
+    Budget("recipes-detail", "patch", "/api/recipes/{own_recipe}/", True,
+           27, 500, RECIPE),
+    Budget("recipes-detail", "delete", "/api/recipes/{own_recipe}/", True,
+           10, 500),
+    Budget("recipes-favorite", "post", "/api/recipes/{new_favorite}/favorite/",
+           True, 4, 200),
+    Budget("recipes-favorite", "delete", "/api/recipes/{favorite}/favorite/",
+           True, 4, 200),
+    Budget("recipes-shopping-cart", "post",
+           "/api/recipes/{new_cart}/shopping_cart/", True, 4, 200),
+    Budget("recipes-shopping-cart", "delete",
+           "/api/recipes/{cart}/shopping_cart/", True, 4, 200),
+    Budget("recipes-download-shopping-cart", "get",
+           "/api/recipes/download_shopping_cart/", True, 3, 300),
+    Budget("tags-list", "get", "/api/tags/", False, 0, 100),
+    Budget("tags-detail", "get", "/api/tags/{tag}/", False, 1, 100),
+    Budget("ingredients-list", "get", "/api/ingredients/?name={prefix}",
+           False, 1, 200),
+    Budget("ingredients-detail", "get", "/api/ingredients/{ingredient}/",
+           False, 1, 100),
+    Budget("users-list", "get", "/api/users/", True, 3, 200),
+    Budget("users-detail", "get", "/api/users/{author}/", True, 2, 200),
+    Budget("users-me", "get", "/api/users/me/", True, 2, 200),
+    Budget("users-subscriptions", "get", "/api/users/subscriptions/", True,
+           4, 300),
+    Budget("users-subscribe", "post", "/api/users/{author}/subscribe/", True,
+           7, 300),
+    Budget("users-subscribe", "delete", "/api/users/{followed}/subscribe/",
+           True, 4, 200),
+    Budget("login", "post", "/api/auth/token/login/", False, 3, 1000,
+           {"email": "{email}", "password": "synthetic-password"}),
+    Budget("logout", "post", "/api/auth/token/logout/", True, 3, 200),
+    Budget("users-list", "post", "/api/users/", False, 5, 1000, {
+        "email": "query-budget-new@example.com",
+        "username": "query-budget-new",
+        "first_name": "Query",
+        "last_name": "Budget",
+        "password": "Sesame-Lantern-937",
+    }),
+    Budget("users-set-password", "post", "/api/users/set_password/", True,
+           2, 2000, {
+               "current_password": "synthetic-password",
+               "new_password": "Query-Budget-123",
+           }),
+    Budget("users-me", "delete", "/api/users/me/", True, 11, 1000,
+           {"current_password": "synthetic-password"}),
+    # The stream itself authenticates the ticket from the cache only.
+    Budget("users-events-ticket", "post", "/api/users/me/events/ticket/",
+           True, 1, 200),
+    Budget("recipes-export", "get", "/api/recipes/export/?author={author}",
+           "admin", 4, 1000),
+    # Admin changelists and forms, the client is a logged in superuser.
+    Budget("admin-recipes", "get", "/admin/recipes/recipe/", "admin", 5,
+           500),
+    Budget("admin-recipes", "get",
+           "/admin/recipes/recipe/?author__id__exact={author}", "admin", 6,
+           500),
+    Budget("admin-recipes", "get", "/admin/recipes/recipe/?q={prefix}",
+           "admin", 5, 500),
+    # The ingredient rows render without a query each, 9 for any recipe.
+    Budget("admin-recipe", "get", "/admin/recipes/recipe/{recipe}/change/",
+           "admin", 9, 500),
+    Budget("admin-favorites", "get", "/admin/recipes/favorite/", "admin", 4,
+           500),
+    Budget("admin-carts", "get", "/admin/recipes/shoppingcart/", "admin", 4,
+           500),
+    Budget("admin-users", "get", "/admin/users/user/", "admin", 4, 500),
+    Budget("admin-follows", "get", "/admin/users/follow/", "admin", 4, 500),
+    Budget("admin-autocomplete", "get",
+           "/admin/autocomplete/?app_label=recipes&model_name=recipe"
+           "&field_name=author&term={prefix}", "admin", 3, 300),
+)
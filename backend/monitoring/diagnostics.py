@@ -0,0 +1,107 @@
+import logging
+import re
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger("foodgram.diagnostics")
+
+IN_LIST = re.compile(r"IN \((?:%s, )*%s\)")
+LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+
+
+def normalize(sql):
+    """Template of a query: literals and IN lists of any length
+    become placeholders, so the same query in a loop compares equal."""
+    return LITERALS.sub("?", IN_LIST.sub("IN (...)", sql))
+
+
+recording = ContextVar("recording", default=None)
+
+
+class RepeatedQueries(AssertionError):
+    def __init__(self, repeated):
+        self.repeated = repeated
+        super().__init__("Repeated queries:\n" + "\n".join(
+            f"{count}x {template}" for template, count in repeated
+        ))
+
+
+def record_query(execute, sql, params, many, context):
+    """Execute wrapper of every connection, keeps the query and its
+    duration in the record_queries() block of the current context,
+    whichever thread runs it."""
+    queries = recording.get()
+    if queries is None:
+        return execute(sql, params, many, context)
+    start = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        queries.append((
+            context["connection"].alias, sql, params, many,
+            perf_counter() - start,
+        ))
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def record_queries(aliases=None):
+    """List of the queries of the block, also the ones it runs on other
+    threads that copy its context, such as the async executor."""
+    queries = []
+    token = recording.set(queries)
+    try:
+        yield queries
+    finally:
+        recording.reset(token)
+        if aliases is not None:
+            queries[:] = [query for query in queries if query[0] in aliases]
+
+
+def repeated_queries(queries, threshold):
+    counts = Counter(normalize(query[1]) for query in queries)
+    return [
+        (template, count) for template, count in counts.most_common()
+        if count > threshold
+    ]
+
+
+def slow_queries(queries, threshold_ms):
+    return [
+        query for query in queries if query[4] * 1000 >= threshold_ms
+    ]
+
+
+def explain(alias, sql, params):
+    """EXPLAIN (ANALYZE, BUFFERS) of a select, the plain plan elsewhere."""
+    connection = connections[alias]
+    if not sql.lstrip().upper().startswith("SELECT"):
+        return ""
+    options = {}
+    if connection.vendor == "postgresql":
+        options = {"analyze": True, "buffers": True}
+    prefix = connection.ops.explain_query_prefix(**options)
+    with connection.cursor() as cursor:
+        cursor.execute(f"{prefix} {sql}", params)
+        return "\n".join(" ".join(map(str, row)) for row in cursor.fetchall())
+
+
+@contextmanager
+def assert_no_repeated_queries(threshold=None, aliases=None):
+    """Raises RepeatedQueries when one query template of the block runs
+    more than threshold times, i.e. when the code has an N+1."""
+    threshold = threshold or settings.REPEATED_QUERY_THRESHOLD
+    with record_queries(aliases) as queries:
+        yield queries
+    repeated = repeated_queries(queries, threshold)
+    if repeated:
+        raise RepeatedQueries(repeated)
@@ -0,0 +1,57 @@
+import json
+
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+from monitoring.benchmarks import BenchmarkError, compare, run_benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        "Times the serializer and shopping list hot paths on fixed "
+        "fixtures (rolled back afterwards) and prints json results."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument(
+            "--only", nargs="*", help="benchmarks whose name contains these"
+        )
+        parser.add_argument("--output", help="write the results to a file")
+        parser.add_argument("--baseline", help="results to compare with")
+        parser.add_argument(
+            "--diff", nargs=2, metavar=("BASE", "CURRENT"),
+            help="compare two stored results without running",
+        )
+
+    # The benchmarked views are called far more often than the limits.
+    @override_settings(THROTTLING=False)
+    def handle(self, *args, **options):
+        if options["diff"]:
+            base, current = (self.load(path) for path in options["diff"])
+            self.print_comparison(base, current)
+            return
+        with transaction.atomic():
+            try:
+                results = run_benchmarks(options["repeat"], options["only"])
+            except BenchmarkError as error:
+                raise CommandError(error)
+            finally:
+                transaction.set_rollback(True)
+        output = json.dumps({"benchmarks": results}, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                file.write(output)
+        self.stdout.write(output)
+        if options["baseline"]:
+            self.print_comparison(self.load(options["baseline"]), results)
+
+    def load(self, path):
+        with open(path) as file:
+            return json.load(file)["benchmarks"]
+
+    def print_comparison(self, base, current):
+        for name, before, after, ratio in compare(base, current):
+            self.stdout.write(
+                f"{name:50} {before:10.3f} -> {after:10.3f} ms  x{ratio:.2f}"
+            )
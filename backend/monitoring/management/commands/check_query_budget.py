@@ -0,0 +1,227 @@
+import json
+import shutil
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from statistics import median
+from time import perf_counter
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from monitoring.budgets import BUDGETS
+from monitoring.diagnostics import (RepeatedQueries,
+                                    assert_no_repeated_queries)
+from recipes.catalog import SNAPSHOT_DIR
+from recipes.models import Ingredient, Recipe, Tag
+from rest_framework.authtoken.models import Token
+
+User = get_user_model()
+
+
+def fill(value, sample):
+    if isinstance(value, str):
+        formatted = value.format(**sample)
+        return int(formatted) if formatted.isdigit() else formatted
+    if isinstance(value, list):
+        return [fill(item, sample) for item in value]
+    if isinstance(value, dict):
+        return {key: fill(item, sample) for key, item in value.items()}
+    return value
+
+
+def first(queryset, what):
+    obj = queryset.first()
+    if obj is None:
+        raise CommandError(
+            f"the dataset has no {what}, run generate_dataset with more "
+            "users and recipes"
+        )
+    return obj
+
+
+@contextmanager
+def temporary_media():
+    """Uploads of the measured requests go to a temporary MEDIA_ROOT,
+    the rollback removes their rows but not their files. The catalog
+    snapshots are copied along, the catalog lists are served from them."""
+    media_root = tempfile.mkdtemp()
+    snapshots = Path(settings.MEDIA_ROOT) / SNAPSHOT_DIR
+    try:
+        if snapshots.is_dir():
+            shutil.copytree(snapshots, Path(media_root) / SNAPSHOT_DIR)
+        with override_settings(MEDIA_ROOT=media_root):
+            yield
+    finally:
+        shutil.rmtree(media_root, ignore_errors=True)
+
+
+class Command(BaseCommand):
+    help = (
+        "Fails when an endpoint exceeds its query budget from "
+        "monitoring/budgets.py or runs one query more than "
+        "REPEATED_QUERY_THRESHOLD times, and with --enforce-ms when it "
+        "exceeds its time limit. Run it on generate_dataset data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=3)
+        parser.add_argument("--json", action="store_true")
+        parser.add_argument(
+            "--enforce-ms", action="store_true",
+            help="also fail on the millisecond limits, which depend on "
+            "the machine and are only reported by default",
+        )
+
+    def sample(self):
+        """Objects the budget urls are filled with."""
+        user = (
+            User.objects.filter(username__startswith="synthetic")
+            .annotate(follows=Count("follower"))
+            .order_by("-follows")
+            .first()
+        )
+        if user is None:
+            raise CommandError("run generate_dataset first")
+        recipes = Recipe.objects.exclude(author=user)
+        tag = first(Tag.objects.all(), "tags")
+        ingredient = first(Ingredient.objects.all(), "ingredients")
+        return user, {
+            "email": user.email,
+            "recipe": first(recipes, "recipes of other users").pk,
+            "own_recipe": Recipe.objects.filter(author=user).first()
+            or Recipe.objects.create(
+                author=user, name="Own recipe", text="text", cooking_time=1
+            ),
+            "new_favorite": first(
+                recipes.exclude(favorite__user=user), "recipes to favorite"
+            ).pk,
+            "favorite": first(
+                recipes.filter(favorite__user=user), "favorites"
+            ).pk,
+            "new_cart": first(
+                recipes.exclude(shopping_cart__user=user),
+                "recipes to add to the cart",
+            ).pk,
+            "cart": first(
+                recipes.filter(shopping_cart__user=user), "cart items"
+            ).pk,
+            "author": first(
+                User.objects.exclude(pk=user.pk)
+                .exclude(following__user=user),
+                "users to follow",
+            ).pk,
+            "followed": first(
+                User.objects.filter(following__user=user), "follows"
+            ).pk,
+            "tag": tag.pk,
+            "tag_slug": tag.slug,
+            "ingredient": ingredient.pk,
+            "prefix": ingredient.name[:2],
+        }
+
+    def clients(self, user):
+        """Anonymous, authenticated and admin clients by Budget.auth."""
+        token, _ = Token.objects.get_or_create(user=user)
+        superuser = User.objects.create_superuser(
+            username="query-budget-admin",
+            email="query-budget-admin@example.com",
+            password=None,
+            first_name="Query",
+            last_name="Budget",
+        )
+        admin = Client(
+            HTTP_HOST="localhost",
+            HTTP_AUTHORIZATION=(
+                f"Token {Token.objects.create(user=superuser).key}"
+            ),
+        )
+        admin.force_login(superuser)
+        return {
+            False: Client(HTTP_HOST="localhost"),
+            True: Client(
+                HTTP_HOST="localhost",
+                HTTP_AUTHORIZATION=f"Token {token.key}",
+            ),
+            "admin": admin,
+        }
+
+    def measure(self, client, budget, sample):
+        url = budget.url.format(**sample)
+        data = json.dumps(fill(budget.data, sample)) if budget.data else ""
+        times = []
+        repeated = []
+        for _ in range(self.repeat):
+            with transaction.atomic():
+                with CaptureQueriesContext(connection) as queries:
+                    start = perf_counter()
+                    try:
+                        with assert_no_repeated_queries():
+                            response = client.generic(
+                                budget.method.upper(), url, data,
+                                content_type="application/json",
+                            )
+                            if response.streaming:
+                                b"".join(response.streaming_content)
+                    except RepeatedQueries as error:
+                        repeated = error.repeated
+                    times.append((perf_counter() - start) * 1000)
+                transaction.set_rollback(True)
+        return (
+            url, response.status_code, len(queries), median(times), repeated
+        )
+
+    # Budgets are for a cache miss, the read cache would hide them, and
+    # the repeated requests would run into the rate limits.
+    @temporary_media()
+    @override_settings(READ_CACHE_TIMEOUT=0, THROTTLING=False)
+    @transaction.atomic
+    def handle(self, *args, **options):
+        self.repeat = options["repeat"]
+        user, sample = self.sample()
+        sample["own_recipe"] = getattr(
+            sample["own_recipe"], "pk", sample["own_recipe"]
+        )
+        clients = self.clients(user)
+        results = []
+        for budget in BUDGETS:
+            url, status, queries, ms, repeated = self.measure(
+                clients[budget.auth], budget, sample
+            )
+            results.append({
+                "name": budget.name,
+                "method": budget.method,
+                "url": url,
+                "status": status,
+                "queries": queries,
+                "query_budget": budget.queries,
+                "ms": round(ms, 1),
+                "ms_budget": budget.ms,
+                "repeated": repeated,
+                "ok": status < 400 and queries <= budget.queries
+                and not repeated
+                and (ms <= budget.ms or not options["enforce_ms"]),
+            })
+        transaction.set_rollback(True)
+
+        if options["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+        else:
+            for result in results:
+                self.stdout.write(
+                    "{mark} {method:6} {url:55} {status} "
+                    "{queries:3}/{query_budget:<3} queries "
+                    "{ms:7.1f}/{ms_budget} ms".format(
+                        mark="ok  " if result["ok"] else "FAIL",
+                        **result,
+                    )
+                )
+                for template, count in result["repeated"]:
+                    self.stdout.write(f"     N+1: {count}x {template}")
+        failed = [result for result in results if not result["ok"]]
+        if failed:
+            raise CommandError(f"{len(failed)} endpoints over budget")
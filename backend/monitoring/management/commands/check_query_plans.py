@@ -0,0 +1,119 @@
+import json
+
+from django.core.management import CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from monitoring.budgets import BUDGETS
+
+from .check_query_budget import Command as BudgetCommand
+from .check_query_budget import fill, temporary_media
+
+# Tables that grow with the users and their recipes, a sequential scan
+# of one of them makes the request slower as the data grows.
+LARGE_TABLES = {
+    "recipes_recipe",
+    "recipes_recipecard",
+    "recipes_recipe_tags",
+    "recipes_ingredientinrecipe",
+    "recipes_ingredient",
+    "recipes_favorite",
+    "recipes_shoppingcart",
+    "users_user",
+    "users_follow",
+}
+
+# Admin substring searches, LIKE '%term%' can not use a btree index.
+SEARCH_PARAMS = ("q=", "term=")
+
+
+def seq_scans(plan):
+    """Relations read by the Seq Scan nodes of an EXPLAIN JSON plan."""
+    if plan["Node Type"] == "Seq Scan":
+        yield plan["Relation Name"]
+    for child in plan.get("Plans", ()):
+        yield from seq_scans(child)
+
+
+class Command(BudgetCommand):
+    help = (
+        "Fails when a query of a monitoring/budgets.py endpoint reads a "
+        "large table with a sequential scan. Sequential scans are "
+        "disabled while planning, so the ones left have no usable index "
+        "even on a small dataset. PostgreSQL only."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--json", action="store_true")
+
+    def capture(self, client, budget, sample):
+        url = budget.url.format(**sample)
+        data = json.dumps(fill(budget.data, sample)) if budget.data else ""
+        with transaction.atomic():
+            with CaptureQueriesContext(connection) as queries:
+                response = client.generic(
+                    budget.method.upper(), url, data,
+                    content_type="application/json",
+                )
+                if response.streaming:
+                    b"".join(response.streaming_content)
+            transaction.set_rollback(True)
+        return url, [
+            query["sql"] for query in queries.captured_queries
+            if query["sql"].lstrip().upper().startswith("SELECT")
+        ]
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}")
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return plan[0]["Plan"]
+
+    @temporary_media()
+    @override_settings(READ_CACHE_TIMEOUT=0, THROTTLING=False)
+    @transaction.atomic
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("query plans are checked on PostgreSQL only")
+        user, sample = self.sample()
+        sample["own_recipe"] = getattr(
+            sample["own_recipe"], "pk", sample["own_recipe"]
+        )
+        clients = self.clients(user)
+        results = []
+        for budget in BUDGETS:
+            if any(param in budget.url for param in SEARCH_PARAMS):
+                continue
+            url, statements = self.capture(
+                clients[budget.auth], budget, sample
+            )
+            for sql in dict.fromkeys(statements):
+                tables = sorted(set(seq_scans(self.explain(sql))))
+                results.append({
+                    "method": budget.method,
+                    "url": url,
+                    "sql": sql,
+                    "seq_scans": tables,
+                    "ok": not LARGE_TABLES & set(tables),
+                })
+        transaction.set_rollback(True)
+
+        failed = [result for result in results if not result["ok"]]
+        if options["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+        else:
+            for result in failed:
+                self.stdout.write(
+                    "FAIL {method:6} {url}\n     seq scan on "
+                    "{tables}\n     {sql}".format(
+                        tables=", ".join(result["seq_scans"]), **result
+                    )
+                )
+            self.stdout.write(
+                f"{len(results) - len(failed)}/{len(results)} "
+                "queries use indexes on the large tables"
+            )
+        if failed:
+            raise CommandError(f"{len(failed)} queries scan large tables")
@@ -0,0 +1,293 @@
+import json
+import os
+import random
+import threading
+from collections import defaultdict
+from time import monotonic, perf_counter
+
+import requests
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand, CommandError
+from recipes.models import Ingredient, Recipe, Tag
+
+User = get_user_model()
+
+PASSWORD = "synthetic-password"
+SCENARIOS = {
+    "browse": 50,
+    "login": 5,
+    "favorite": 15,
+    "shopping_cart": 10,
+    "subscriptions": 15,
+    "download": 5,
+}
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(fraction * (len(values) - 1))))
+    return values[index]
+
+
+def process_tree_rss(pid):
+    """Resident memory in bytes of the process and its descendants."""
+    total, pending = 0, [pid]
+    while pending:
+        pid = pending.pop()
+        try:
+            with open(f"/proc/{pid}/status") as status:
+                for line in status:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) * 1024
+            for task in os.listdir(f"/proc/{pid}/task"):
+                with open(f"/proc/{pid}/task/{task}/children") as children:
+                    pending.extend(map(int, children.read().split()))
+        except FileNotFoundError:
+            continue
+    return total
+
+
+class Worker(threading.Thread):
+    """Runs random scenarios against the server until the deadline."""
+
+    def __init__(self, command, email, deadline, seed):
+        super().__init__(daemon=True)
+        self.command = command
+        self.email = email
+        self.deadline = deadline
+        self.rng = random.Random(seed)
+        self.session = requests.Session()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.throttled = 0
+
+    def call(self, name, method, path, **kwargs):
+        start = perf_counter()
+        try:
+            response = self.session.request(
+                method, self.command.base_url + path, timeout=30, **kwargs
+            )
+            ok = response.status_code < 400
+            self.throttled += response.status_code == 429
+        except requests.RequestException:
+            response, ok = None, False
+        self.latencies[name].append(perf_counter() - start)
+        if not ok:
+            self.errors[name] += 1
+        return response
+
+    def login(self):
+        response = self.call(
+            "auth-login", "post", "/api/auth/token/login/",
+            json={"email": self.email, "password": PASSWORD},
+        )
+        if response is not None and response.ok:
+            self.session.headers["Authorization"] = (
+                f"Token {response.json()['auth_token']}"
+            )
+
+    def run(self):
+        self.login()
+        names, weights = zip(*SCENARIOS.items())
+        while monotonic() < self.deadline:
+            scenario = self.rng.choices(names, weights)[0]
+            getattr(self, f"scenario_{scenario}")()
+
+    def scenario_browse(self):
+        tag = self.rng.choice(self.command.tags)
+        page = self.rng.randint(1, 5)
+        self.call("tags-list", "get", "/api/tags/")
+        self.call(
+            "recipes-list", "get",
+            f"/api/recipes/?page={page}&limit=6&tags={tag}",
+        )
+        recipe = self.rng.choice(self.command.recipes)
+        self.call("recipes-detail", "get", f"/api/recipes/{recipe}/")
+        prefix = self.rng.choice(self.command.prefixes)
+        self.call(
+            "ingredients-list", "get", "/api/ingredients/",
+            params={"name": prefix},
+        )
+
+    def scenario_login(self):
+        self.login()
+
+    def toggle(self, action):
+        recipe = self.rng.choice(self.command.recipes)
+        path = f"/api/recipes/{recipe}/{action}/"
+        name = f"recipes-{action.replace('_', '-')}"
+        self.call(name, "post", path)
+        self.call(name, "delete", path)
+
+    def scenario_favorite(self):
+        self.toggle("favorite")
+        self.call(
+            "recipes-list", "get", "/api/recipes/?is_favorited=1&limit=6"
+        )
+
+    def scenario_shopping_cart(self):
+        self.toggle("shopping_cart")
+
+    def scenario_subscriptions(self):
+        self.call(
+            "users-subscriptions", "get",
+            "/api/users/subscriptions/?recipes_limit=3&limit=6",
+        )
+
+    def scenario_download(self):
+        self.call(
+            "recipes-download-shopping-cart", "get",
+            "/api/recipes/download_shopping_cart/",
+        )
+
+
+class Command(BaseCommand):
+    help = (
+        "Replays a mix of browsing, login, favorite, cart, subscription "
+        "and download scenarios against a running server and reports "
+        "throughput and p50/p95/p99 latency per endpoint as json. "
+        "Expects the generate_dataset users in the server's database. "
+        "With --server-pid the peak memory of the server is reported "
+        "too, to compare the WSGI and ASGI modes at equal memory. Start "
+        "the server with THROTTLING=False, the scenarios exceed the "
+        "rate limits, and the run fails on throttled responses."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+        parser.add_argument("--duration", type=float, default=30)
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument(
+            "--server-pid", type=int,
+            help="gunicorn master pid, to sample the server memory",
+        )
+        parser.add_argument("--output", help="write the report to a file")
+        parser.add_argument("--baseline", help="report to compare with")
+        parser.add_argument(
+            "--threshold", type=float, default=0.1,
+            help="allowed relative p95 and throughput regression",
+        )
+        parser.add_argument(
+            "--error-threshold", type=float, default=0.01,
+            help="allowed increase of the error rate (4xx, 5xx and "
+            "failed connections), in absolute terms",
+        )
+
+    def handle(self, *args, **options):
+        self.base_url = options["base_url"].rstrip("/")
+        emails = list(
+            User.objects.filter(username__startswith="synthetic")
+            .values_list("email", flat=True)[:options["concurrency"]]
+        )
+        if not emails:
+            raise CommandError("run generate_dataset first")
+        self.tags = list(Tag.objects.values_list("slug", flat=True))
+        self.recipes = list(Recipe.objects.values_list("pk", flat=True)[:500])
+        self.prefixes = list({
+            name[:2] for name in Ingredient.objects.values_list(
+                "name", flat=True
+            )[:200]
+        })
+
+        deadline = monotonic() + options["duration"]
+        workers = [
+            Worker(self, emails[number % len(emails)], deadline,
+                   options["seed"] + number)
+            for number in range(options["concurrency"])
+        ]
+        for worker in workers:
+            worker.start()
+        peak_rss = 0
+        for worker in workers:
+            while worker.is_alive():
+                if options["server_pid"]:
+                    peak_rss = max(
+                        peak_rss, process_tree_rss(options["server_pid"])
+                    )
+                worker.join(1)
+
+        report = self.report(workers, options["duration"])
+        if peak_rss:
+            rps = sum(
+                endpoint["rps"] for endpoint in report["endpoints"].values()
+            )
+            report["server"] = {
+                "peak_rss_mb": round(peak_rss / 2 ** 20, 1),
+                "rps_per_gb": round(rps / (peak_rss / 2 ** 30), 1),
+            }
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                file.write(output)
+        self.stdout.write(output)
+        throttled = sum(worker.throttled for worker in workers)
+        if throttled:
+            raise CommandError(
+                f"{throttled} responses were throttled, start the server "
+                "with THROTTLING=False"
+            )
+        if options["baseline"]:
+            self.compare(
+                report, options["baseline"], options["threshold"],
+                options["error_threshold"],
+            )
+
+    def report(self, workers, duration):
+        latencies, errors = defaultdict(list), defaultdict(int)
+        for worker in workers:
+            for name, values in worker.latencies.items():
+                latencies[name].extend(values)
+            for name, count in worker.errors.items():
+                errors[name] += count
+        return {
+            "duration": duration,
+            "endpoints": {
+                name: {
+                    "requests": len(values),
+                    "errors": errors[name],
+                    "error_rate": round(errors[name] / len(values), 4),
+                    "rps": round(len(values) / duration, 2),
+                    "p50_ms": round(percentile(values, 0.5) * 1000, 1),
+                    "p95_ms": round(percentile(values, 0.95) * 1000, 1),
+                    "p99_ms": round(percentile(values, 0.99) * 1000, 1),
+                }
+                for name, values in sorted(latencies.items())
+            },
+        }
+
+    def compare(self, report, baseline_path, threshold, error_threshold):
+        with open(baseline_path) as file:
+            baseline = json.load(file)
+        if "server" in baseline and "server" in report:
+            self.stdout.write(
+                "requests/s per GB of server memory: "
+                f"{baseline['server']['rps_per_gb']} -> "
+                f"{report['server']['rps_per_gb']}"
+            )
+        baseline = baseline["endpoints"]
+        regressions = []
+        for name, base in baseline.items():
+            current = report["endpoints"].get(name)
+            if current is None:
+                regressions.append(f"{name}: missing from the run")
+                continue
+            base_errors = base["errors"] / base["requests"]
+            if current["error_rate"] > base_errors + error_threshold:
+                regressions.append(
+                    f"{name}: error rate {base_errors:.2%} -> "
+                    f"{current['error_rate']:.2%}"
+                )
+            if current["p95_ms"] > base["p95_ms"] * (1 + threshold):
+                regressions.append(
+                    f"{name}: p95 {base['p95_ms']} -> {current['p95_ms']} ms"
+                )
+            if current["rps"] < base["rps"] * (1 - threshold):
+                regressions.append(
+                    f"{name}: {base['rps']} -> {current['rps']} requests/s"
+                )
+        if regressions:
+            raise CommandError(
+                "Regressions over the baseline:\n" + "\n".join(regressions)
+            )
+        self.stdout.write("No regressions over the baseline.")
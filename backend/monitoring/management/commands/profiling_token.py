@@ -0,0 +1,9 @@
+from django.core.management import BaseCommand
+from monitoring.profiling import make_token
+
+
+class Command(BaseCommand):
+    help = "Prints an X-Profile header value that profiles a request."
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"X-Profile: {make_token()}")
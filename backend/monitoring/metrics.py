@@ -0,0 +1,141 @@
+import os
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY,
+                               CollectorRegistry, Counter, Gauge, Histogram,
+                               generate_latest, multiprocess)
+
+LABELS = ("route", "method")
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144, 233, 377)
+
+REQUEST_LATENCY = Histogram(
+    "foodgram_request_seconds", "Total request latency.", LABELS
+)
+SQL_QUERIES = Histogram(
+    "foodgram_sql_queries", "SQL queries per request.", LABELS,
+    buckets=QUERY_BUCKETS,
+)
+SQL_TIME = Histogram(
+    "foodgram_sql_seconds", "Time spent in SQL per request.", LABELS
+)
+SERIALIZATION_TIME = Histogram(
+    "foodgram_serialization_seconds",
+    "Time spent serializing and rendering the response body per "
+    "request, without the SQL run meanwhile.",
+    LABELS,
+)
+DB_POOL_CONNECTIONS = Gauge(
+    "foodgram_db_pool_connections",
+    "Open pooled database connections.",
+    ("database", "state"),
+    multiprocess_mode="livesum",
+)
+DB_POOL_WAIT = Histogram(
+    "foodgram_db_pool_wait_seconds",
+    "Time spent waiting for a pooled database connection.",
+    ("database",),
+)
+DB_POOL_DISCARDED = Counter(
+    "foodgram_db_pool_discarded",
+    "Pooled connections that failed the health check or were broken.",
+    ("database",),
+)
+DB_POOL_TIMEOUTS = Counter(
+    "foodgram_db_pool_timeouts",
+    "Checkouts that gave up waiting for a free connection.",
+    ("database",),
+)
+
+current_stats = ContextVar("current_stats", default=None)
+serializing = ContextVar("serializing", default=False)
+
+
+class RequestStats:
+    __slots__ = ("queries", "sql_time", "serialization_time", "lock")
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.serialization_time = 0.0
+        self.lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        """Database execute wrapper counting the queries and their time."""
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = perf_counter() - start
+            with self.lock:
+                self.sql_time += elapsed
+                self.queries += 1
+
+
+def record_sql(execute, sql, params, many, context):
+    """Execute wrapper of every connection, counts the query into the
+    stats of the current request, whichever thread runs it."""
+    stats = current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    return stats(execute, sql, params, many, context)
+
+
+def install_sql_recorder(sender, connection, **kwargs):
+    if record_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_sql)
+
+
+@contextmanager
+def timed_serialization():
+    """Adds the time of the block, less the SQL it ran, to the
+    serialization time of the request. Nested blocks count once."""
+    stats = current_stats.get()
+    if stats is None or serializing.get():
+        yield
+        return
+    token = serializing.set(True)
+    start, sql_time = perf_counter(), stats.sql_time
+    try:
+        yield
+    finally:
+        serializing.reset(token)
+        elapsed = perf_counter() - start - (stats.sql_time - sql_time)
+        with stats.lock:
+            stats.serialization_time += max(elapsed, 0.0)
+
+
+def timed_data(data):
+    """Serializer.data property that runs in timed_serialization()."""
+    def fget(serializer):
+        with timed_serialization():
+            return data.fget(serializer)
+
+    return property(fget)
+
+
+def instrument_serializers():
+    from rest_framework import serializers
+
+    for cls in (serializers.Serializer, serializers.ListSerializer):
+        cls.data = timed_data(cls.data)
+
+
+def observe(route, method, stats, latency):
+    labels = (route, method)
+    REQUEST_LATENCY.labels(*labels).observe(latency)
+    SQL_QUERIES.labels(*labels).observe(stats.queries)
+    SQL_TIME.labels(*labels).observe(stats.sql_time)
+    SERIALIZATION_TIME.labels(*labels).observe(stats.serialization_time)
+
+
+def exposition():
+    """Metrics of every worker when gunicorn runs with
+    PROMETHEUS_MULTIPROC_DIR, of this process otherwise."""
+    registry = REGISTRY
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,123 @@
+import threading
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from .diagnostics import (explain, logger, record_queries, repeated_queries,
+                          slow_queries)
+from .metrics import RequestStats, current_stats, observe
+from .models import QueryReport
+from .profiling import StackSampler, is_triggered, save_profile
+
+
+def route_name(request):
+    match = request.resolver_match
+    return (match.url_name or match.view_name) if match else "unmatched"
+
+
+class MetricsMiddleware:
+    """Records latency, SQL and serialization time of every request
+    under the name of the url it matched."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        start = perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        observe(
+            route_name(request), request.method, stats,
+            perf_counter() - start,
+        )
+        return response
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        start = perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        observe(
+            route_name(request), request.method, stats,
+            perf_counter() - start,
+        )
+        return response
+
+
+class QueryDiagnosticsMiddleware:
+    """Reports slow queries with their plans and repeated (N+1)
+    queries of every request, enabled by QUERY_DIAGNOSTICS."""
+
+    def __init__(self, get_response):
+        if not settings.QUERY_DIAGNOSTICS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with record_queries() as queries:
+            response = self.get_response(request)
+        route = route_name(request)
+        reports = []
+        for alias, sql, params, many, duration in slow_queries(
+            queries, settings.SLOW_QUERY_MS
+        ):
+            reports.append(QueryReport(
+                kind=QueryReport.SLOW,
+                sql=sql,
+                duration_ms=duration * 1000,
+                plan="" if many else explain(alias, sql, params),
+            ))
+        for template, count in repeated_queries(
+            queries, settings.REPEATED_QUERY_THRESHOLD
+        ):
+            reports.append(QueryReport(
+                kind=QueryReport.REPEATED, sql=template, count=count
+            ))
+        for report in reports:
+            report.route, report.method = route, request.method
+            logger.warning(
+                "%s %s %s: %sx %.1fms %s\n%s", report.kind, request.method,
+                route, report.count, report.duration_ms, report.sql,
+                report.plan,
+            )
+        if reports:
+            QueryReport.objects.bulk_create(reports)
+        return response
+
+
+class ProfilingMiddleware:
+    """Samples the stacks of requests carrying a signed X-Profile
+    header or picked with PROFILING_SAMPLE_RATE, other requests
+    pass straight through."""
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not is_triggered(request):
+            return self.get_response(request)
+        start = perf_counter()
+        with StackSampler(
+            threading.get_ident(), settings.PROFILING_INTERVAL
+        ) as sampler:
+            response = self.get_response(request)
+        save_profile(route_name(request), perf_counter() - start, sampler)
+        return response
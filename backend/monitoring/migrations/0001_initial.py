@@ -0,0 +1,47 @@
+# Generated by Django 3.2.21 on 2026-10-19 15:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="QueryReport",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created", models.DateTimeField(auto_now_add=True, db_index=True)),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("slow", "Slow query"),
+                            ("repeated", "Repeated query (N+1)"),
+                        ],
+                        max_length=16,
+                    ),
+                ),
+                ("route", models.CharField(max_length=200)),
+                ("method", models.CharField(max_length=10)),
+                ("sql", models.TextField()),
+                ("count", models.PositiveIntegerField(default=1)),
+                ("duration_ms", models.FloatField(default=0)),
+                ("plan", models.TextField(blank=True)),
+            ],
+            options={
+                "verbose_name": "Query report",
+                "ordering": ("-created",),
+            },
+        ),
+    ]
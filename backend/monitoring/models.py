@@ -0,0 +1,26 @@
+from django.db import models
+
+
+class QueryReport(models.Model):
+    SLOW = "slow"
+    REPEATED = "repeated"
+    KIND_CHOICES = (
+        (SLOW, "Slow query"),
+        (REPEATED, "Repeated query (N+1)"),
+    )
+
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES)
+    route = models.CharField(max_length=200)
+    method = models.CharField(max_length=10)
+    sql = models.TextField()
+    count = models.PositiveIntegerField(default=1)
+    duration_ms = models.FloatField(default=0)
+    plan = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ("-created",)
+        verbose_name = "Query report"
+
+    def __str__(self):
+        return f"{self.get_kind_display()} in {self.route}"
@@ -0,0 +1,12 @@
+from django.conf import settings
+from rest_framework import permissions
+
+
+class IsAdminOrInternal(permissions.BasePermission):
+    message = "Only staff or internal hosts have access."
+
+    def has_permission(self, request, view):
+        return (
+            request.user.is_staff
+            or request.META.get("REMOTE_ADDR") in settings.INTERNAL_IPS
+        )
@@ -0,0 +1,101 @@
+import os
+import random
+import re
+import sys
+import threading
+from collections import Counter
+from pathlib import Path
+from time import time
+
+from django.conf import settings
+from django.core import signing
+
+TOKEN_SALT = "monitoring.profiling"
+PROFILE_NAME = re.compile(r"^[\w.-]+\.collapsed$")
+
+
+def make_token():
+    """Value of the X-Profile header that forces profiling of a request."""
+    return signing.TimestampSigner(salt=TOKEN_SALT).sign("profile")
+
+
+def is_triggered(request):
+    token = request.META.get("HTTP_X_PROFILE")
+    if token:
+        try:
+            signing.TimestampSigner(salt=TOKEN_SALT).unsign(
+                token, max_age=settings.PROFILING_TOKEN_MAX_AGE
+            )
+            return True
+        except signing.BadSignature:
+            pass
+    rate = settings.PROFILING_SAMPLE_RATE
+    return rate > 0 and random.random() < rate
+
+
+def frame_label(code):
+    filename = Path(code.co_filename).name
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Samples the stack of one thread from a background thread
+    and counts the stacks in the collapsed flame graph format."""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            labels = []
+            while frame is not None:
+                labels.append(frame_label(frame.f_code))
+                frame = frame.f_back
+            if labels:
+                self.stacks[";".join(reversed(labels))] += 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self):
+        return "".join(
+            f"{stack} {count}\n" for stack, count in self.stacks.items()
+        )
+
+
+def profiles_dir():
+    path = Path(settings.PROFILING_DIR)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def list_profiles():
+    return sorted(
+        (path for path in profiles_dir().iterdir()
+         if PROFILE_NAME.match(path.name)),
+        key=lambda path: path.stat().st_mtime,
+        reverse=True,
+    )
+
+
+def save_profile(route, duration, sampler):
+    """Writes the profile and drops the oldest ones over the limit."""
+    name = f"{time():.3f}-{route}-{duration * 1000:.0f}ms.collapsed"
+    path = profiles_dir() / re.sub(r"[^\w.-]", "_", name)
+    path.write_text(sampler.collapsed())
+    for old in list_profiles()[settings.PROFILING_MAX_FILES:]:
+        try:
+            os.remove(old)
+        except FileNotFoundError:
+            pass
+    return path
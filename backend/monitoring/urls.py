@@ -0,0 +1,15 @@
+from django.urls import path
+
+from .views import MetricsView, ProfileDownloadView, ProfileListView
+
+app_name = "monitoring"
+
+urlpatterns = [
+    path("metrics", MetricsView.as_view(), name="metrics"),
+    path("profiles/", ProfileListView.as_view(), name="profiles"),
+    path(
+        "profiles/<str:name>/",
+        ProfileDownloadView.as_view(),
+        name="profile-download",
+    ),
+]
@@ -0,0 +1,48 @@
+from django.http import FileResponse, Http404, HttpResponse
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .metrics import exposition
+from .permissions import IsAdminOrInternal
+from .profiling import PROFILE_NAME, list_profiles, profiles_dir
+
+
+class MetricsView(APIView):
+    """Prometheus metrics of the backend."""
+
+    permission_classes = (IsAdminOrInternal,)
+
+    def get(self, request):
+        content, content_type = exposition()
+        return HttpResponse(content, content_type=content_type)
+
+
+class ProfileListView(APIView):
+    """Stored request profiles, newest first."""
+
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return Response([
+            {
+                "name": path.name,
+                "size": path.stat().st_size,
+                "url": request.build_absolute_uri(path.name + "/"),
+            }
+            for path in list_profiles()
+        ])
+
+
+class ProfileDownloadView(APIView):
+    """Profile in the collapsed stacks format of flamegraph.pl."""
+
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request, name):
+        path = profiles_dir() / name
+        if not PROFILE_NAME.match(name) or not path.is_file():
+            raise Http404
+        return FileResponse(
+            path.open("rb"), as_attachment=True, content_type="text/plain"
+        )
@@ -1,33 +1,80 @@
+from api.cards import refresh_cards
 from django.contrib import admin
 from django.contrib.admin import display
 from django.contrib.auth import get_user_model
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 
+from .admin_utils import (AutocompleteFilter, LargeTableAdmin,
+                          PreloadedAutocompleteInline)
+from .deletion import delete_recipes
 from .models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
                      ShoppingCart, Tag)
 
 User = get_user_model
 
 admin.site.register(Tag)
-admin.site.register(Favorite)
 
 
-class IngredientInRecipeAdmin(admin.StackedInline):
+class IngredientInRecipeAdmin(PreloadedAutocompleteInline):
     model = IngredientInRecipe
     autocomplete_fields = ("ingredient",)
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related(
+            "ingredient", "recipe"
+        )
+
 
 @admin.register(Recipe)
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeAdmin(LargeTableAdmin):
     list_display = ("id", "name", "author", "get_in_favorites_count")
+    list_select_related = ("author",)
     readonly_fields = ("get_in_favorites_count",)
-    list_filter = ("author", "tags", "name")
+    list_filter = (("author", AutocompleteFilter), "tags")
     search_fields = ("name", "author__username")
+    autocomplete_fields = ("author",)
     ordering = ("-pub_date",)
     inlines = (IngredientInRecipeAdmin,)
 
-    @display(description="In favorite amount")
+    def get_queryset(self, request):
+        favorites = (
+            Favorite.objects.filter(recipe=OuterRef("pk"))
+            .order_by()
+            .values("recipe")
+            .annotate(count=Count("pk"))
+            .values("count")
+        )
+        return super().get_queryset(request).annotate(
+            favorites_count=Coalesce(
+                Subquery(favorites, output_field=IntegerField()), 0
+            )
+        )
+
+    def get_deleted_objects(self, objs, request):
+        """Lists the recipes only, the rows referencing them are
+        deleted by the database and not loaded for the confirmation."""
+        objs = list(objs)
+        return (
+            [str(obj) for obj in objs],
+            {Recipe._meta.verbose_name_plural: len(objs)},
+            set(),
+            [],
+        )
+
+    def delete_model(self, request, obj):
+        delete_recipes(Recipe.objects.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        delete_recipes(queryset)
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        refresh_cards(Recipe.objects.filter(pk=form.instance.pk))
+
+    @display(description="In favorite amount", ordering="favorites_count")
     def get_in_favorites_count(self, obj):
-        return Favorite.objects.filter(recipe=obj).count()
+        return obj.favorites_count
 
 
 @admin.register(Ingredient)
@@ -36,9 +83,22 @@ class IngredientAdmin(admin.ModelAdmin):
     search_fields = ("^name",)
 
 
+@admin.register(Favorite)
+class FavoriteAdmin(LargeTableAdmin):
+    list_display = ("user", "recipe", "date_added")
+    list_select_related = ("user", "recipe")
+    list_filter = (("user", AutocompleteFilter),
+                   ("recipe", AutocompleteFilter))
+    autocomplete_fields = ("user", "recipe")
+
+
 @admin.register(ShoppingCart)
-class ShoppingCartAdmin(admin.ModelAdmin):
+class ShoppingCartAdmin(LargeTableAdmin):
     list_display = (
         "user",
         "recipe",
     )
+    list_select_related = ("user", "recipe")
+    list_filter = (("user", AutocompleteFilter),
+                   ("recipe", AutocompleteFilter))
+    autocomplete_fields = ("user", "recipe")
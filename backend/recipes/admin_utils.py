@@ -0,0 +1,159 @@
+"""Changelist and form helpers for the admins of the large tables."""
+import json
+
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.paginator import Paginator
+from django.db import connections
+from django.forms import ModelChoiceField
+from django.forms.models import BaseInlineFormSet
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+
+
+def estimate_count(queryset):
+    """Row estimate of the PostgreSQL planner for the queryset."""
+    sql, params = queryset.query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]["Plan"]["Plan Rows"]
+
+
+class EstimatedCountPaginator(Paginator):
+    """Uses the planner estimate when it exceeds ADMIN_EXACT_COUNT_LIMIT
+    rows, an exact count reads every matching row."""
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if connections[queryset.db].vendor == "postgresql":
+            estimate = estimate_count(queryset)
+            if estimate > settings.ADMIN_EXACT_COUNT_LIMIT:
+                return estimate
+        return queryset.count()
+
+
+class AutocompleteFilter(admin.FieldListFilter):
+    """Foreign key filter with the autocomplete widget of the related
+    admin, instead of a sidebar link for every related object."""
+
+    template = "admin/autocomplete_filter.html"
+
+    def __init__(self, field, request, params, model, model_admin,
+                 field_path):
+        self.lookup_kwarg = f"{field_path}__{field.target_field.name}__exact"
+        self.lookup_val = params.get(self.lookup_kwarg)
+        super().__init__(
+            field, request, params, model, model_admin, field_path
+        )
+        self.form_field = ModelChoiceField(
+            field.remote_field.model._default_manager.all(),
+            widget=AutocompleteSelect(field, model_admin.admin_site),
+            required=False,
+        )
+
+    def expected_parameters(self):
+        return [self.lookup_kwarg]
+
+    def has_output(self):
+        return True
+
+    def choices(self, changelist):
+        self.rendered_widget = self.form_field.widget.render(
+            self.lookup_kwarg,
+            self.lookup_val,
+            attrs={
+                "data-filter-url": changelist.get_query_string(
+                    remove=[self.lookup_kwarg]
+                ),
+            },
+        )
+        yield {
+            "selected": self.lookup_val is None,
+            "query_string": changelist.get_query_string(
+                remove=[self.lookup_kwarg]
+            ),
+            "display": _("All"),
+        }
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Changelist without the exact counts of the whole table."""
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    @property
+    def media(self):
+        return super().media + AutocompleteSelect(None, self.admin_site).media
+
+
+class PreloadedAutocompleteSelect(AutocompleteSelect):
+    """Renders the selected objects found in preloaded without the
+    query AutocompleteSelect makes for every widget."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.preloaded = {}
+
+    def optgroups(self, name, value, attr=None):
+        selected = [
+            str(pk) for pk in value
+            if str(pk) not in self.choices.field.empty_values
+        ]
+        if not selected or any(pk not in self.preloaded for pk in selected):
+            return super().optgroups(name, value, attr)
+        options = []
+        if not self.is_required and not self.allow_multiple_selected:
+            options.append(self.create_option(name, "", "", False, 0))
+        for pk in selected:
+            options.append(self.create_option(
+                name,
+                pk,
+                self.choices.field.label_from_instance(self.preloaded[pk]),
+                set(selected),
+                len(options),
+            ))
+        return [(None, options, 0)]
+
+
+class PreloadedAutocompleteFormSet(BaseInlineFormSet):
+    """Hands the related objects of all the rows to their
+    PreloadedAutocompleteSelect widgets, the inline queryset should
+    select_related them."""
+
+    def _construct_form(self, i, **kwargs):
+        form = super()._construct_form(i, **kwargs)
+        for name, field in form.fields.items():
+            widget = getattr(field.widget, "widget", field.widget)
+            if isinstance(widget, PreloadedAutocompleteSelect):
+                widget.preloaded = self.preloaded(name)
+        return form
+
+    def preloaded(self, name):
+        if not hasattr(self, "_preloaded"):
+            self._preloaded = {}
+        if name not in self._preloaded:
+            attname = self.model._meta.get_field(name).attname
+            self._preloaded[name] = {
+                str(getattr(obj, attname)): getattr(obj, name)
+                for obj in self.get_queryset()
+            }
+        return self._preloaded[name]
+
+
+class PreloadedAutocompleteInline(admin.StackedInline):
+    """Inline whose autocomplete_fields render without a query per row."""
+
+    formset = PreloadedAutocompleteFormSet
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name in self.get_autocomplete_fields(request):
+            kwargs.setdefault("widget", PreloadedAutocompleteSelect(
+                db_field, self.admin_site, using=kwargs.get("using")
+            ))
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
@@ -0,0 +1,151 @@
+import fcntl
+import gzip
+import json
+import os
+import re
+from contextlib import contextmanager
+from pathlib import Path
+from time import time
+from uuid import uuid4
+
+import brotli
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db.models import Max
+
+from .models import CatalogChange, Ingredient, Tag
+
+CATALOGS = {
+    CatalogChange.TAGS: (Tag, ("id", "name", "color", "slug")),
+    CatalogChange.INGREDIENTS: (
+        Ingredient,
+        ("id", "name", "measurement_unit"),
+    ),
+}
+SNAPSHOT_DIR = "catalog"
+MANIFEST_NAME = f"{SNAPSHOT_DIR}/manifest.json"
+LOCK_NAME = f"{SNAPSHOT_DIR}/.lock"
+ENCODINGS = (
+    ("br", ".br", brotli.compress),
+    ("gzip", ".gz", lambda data: gzip.compress(data, compresslevel=9)),
+)
+
+
+def current_version(catalog):
+    """Id of the latest change of the catalog, 0 if it never changed."""
+    return (
+        CatalogChange.objects.filter(catalog=catalog)
+        .aggregate(version=Max("id"))["version"] or 0
+    )
+
+
+def snapshot_name(catalog, version):
+    return f"{SNAPSHOT_DIR}/{catalog}.{version}.json"
+
+
+def read_manifest():
+    if not default_storage.exists(MANIFEST_NAME):
+        return {}
+    with default_storage.open(MANIFEST_NAME) as manifest:
+        return json.load(manifest)
+
+
+def _store(name, content):
+    """Replaces the file with a rename, so readers see either the
+    old or the new content and concurrent writers never clash."""
+    path = Path(default_storage.path(name))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp = path.with_name(f".{path.name}.{uuid4().hex}.tmp")
+    temp.write_bytes(content)
+    os.replace(temp, path)
+
+
+@contextmanager
+def _manifest_lock():
+    path = Path(default_storage.path(LOCK_NAME))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _prune(catalog, current):
+    """Deletes the snapshots replaced more than CATALOG_SNAPSHOT_GRACE
+    seconds ago, clients holding an older manifest still find them."""
+    directory = Path(default_storage.path(SNAPSHOT_DIR))
+    pattern = re.compile(rf"{re.escape(catalog)}\.(\d+)\.json")
+    expired = time() - settings.CATALOG_SNAPSHOT_GRACE
+    for path in directory.iterdir():
+        match = pattern.match(path.name)
+        if (
+            match and int(match[1]) < current
+            and path.stat().st_mtime < expired
+        ):
+            path.unlink(missing_ok=True)
+
+
+def write_snapshot(catalog):
+    """Dumps the catalog into a versioned json file next to
+    its gzip and brotli versions and points the manifest at it."""
+    model, fields = CATALOGS[catalog]
+    version = current_version(catalog)
+    payload = json.dumps(
+        list(model.objects.values(*fields)),
+        ensure_ascii=False,
+        separators=(",", ":"),
+    ).encode("utf-8")
+    name = snapshot_name(catalog, version)
+    for _, suffix, compress in ENCODINGS:
+        _store(name + suffix, compress(payload))
+    _store(name, payload)
+
+    with _manifest_lock():
+        manifest = read_manifest()
+        previous = manifest.get(catalog)
+        if previous and previous["version"] > version:
+            # A writer that started later already published a newer one.
+            return previous
+        manifest[catalog] = {
+            "version": version,
+            "path": name,
+            "url": default_storage.url(name),
+        }
+        _store(MANIFEST_NAME, json.dumps(manifest).encode("utf-8"))
+        if previous and previous["path"] != name:
+            # The grace period of the replaced files starts now.
+            for suffix in ("",) + tuple(suffix for _, suffix, _ in ENCODINGS):
+                path = default_storage.path(previous["path"] + suffix)
+                if os.path.exists(path):
+                    os.utime(path)
+        _prune(catalog, version)
+    return manifest[catalog]
+
+
+def latest_snapshot(catalog):
+    """Manifest entry of the catalog, None until build_catalog_snapshots
+    or a catalog change has written one."""
+    entry = read_manifest().get(catalog)
+    if entry is None or not default_storage.exists(entry["path"]):
+        return None
+    return entry
+
+
+def catalog_delta(catalog, since):
+    """Rows changed and ids deleted after the given version."""
+    model, fields = CATALOGS[catalog]
+    latest = {}
+    version = since
+    changes = CatalogChange.objects.filter(
+        catalog=catalog, id__gt=since
+    ).values_list("id", "object_id", "deleted")
+    for version, object_id, deleted in changes:
+        latest[object_id] = deleted
+    changed = [pk for pk, deleted in latest.items() if not deleted]
+    return {
+        "version": version,
+        "changed": list(model.objects.filter(id__in=changed).values(*fields)),
+        "deleted": [pk for pk, deleted in latest.items() if deleted],
+    }
@@ -0,0 +1,71 @@
+"""Deletion without the Collector, for objects with many dependent rows.
+
+On PostgreSQL the foreign keys of recipes.migrations.0011 cascade in the
+database, so one DELETE removes the rows and everything referencing them.
+No delete signals are sent, callers handle the side effects. Elsewhere
+the functions fall back to QuerySet.delete().
+"""
+from api import cards
+from django.core.files.storage import default_storage
+from django.db import connections, router
+
+from .models import DeletedFile, Recipe
+
+
+def cascades(model):
+    using = router.db_for_write(model)
+    return connections[using].vendor == "postgresql"
+
+
+def delete_ids(model, ids):
+    """Deletes the rows with the given primary keys in one DELETE."""
+    if not ids:
+        return 0
+    connection = connections[router.db_for_write(model)]
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {quote(model._meta.db_table)} "
+            f"WHERE {quote(model._meta.pk.column)} = ANY(%s)",
+            [ids],
+        )
+        return cursor.rowcount
+
+
+def fast_delete(queryset):
+    """Deletes the rows of the queryset with a single DELETE by id."""
+    if not cascades(queryset.model):
+        return queryset.delete()[0]
+    return delete_ids(
+        queryset.model, list(queryset.values_list("pk", flat=True))
+    )
+
+
+def delete_recipes(queryset):
+    """fast_delete of recipes, their images are queued for removal."""
+    if not cascades(Recipe):
+        return queryset.delete()[0]
+    rows = list(queryset.values_list("pk", "image"))
+    queue_files(image for _, image in rows)
+    cards.invalidate()
+    return delete_ids(Recipe, [pk for pk, _ in rows])
+
+
+def queue_files(names):
+    DeletedFile.objects.bulk_create(
+        DeletedFile(name=name) for name in names if name
+    )
+
+
+def delete_queued_files(batch_size):
+    """Removes a batch of queued files from the storage, except the ones
+    another recipe still uses. Returns the number of queue rows done."""
+    queued = list(DeletedFile.objects.all()[:batch_size])
+    names = {item.name for item in queued}
+    used = set(
+        Recipe.objects.filter(image__in=names).values_list("image", flat=True)
+    )
+    for name in names - used:
+        default_storage.delete(name)
+    DeletedFile.objects.filter(pk__in=[item.pk for item in queued]).delete()
+    return len(queued)
@@ -0,0 +1,106 @@
+import threading
+from collections import defaultdict, namedtuple
+from types import MappingProxyType
+from uuid import uuid4
+
+from api import invalidation
+from django.core.cache import cache
+
+from .models import Ingredient, IngredientInRecipe, Recipe, Tag
+
+VERSION_KEY = "dimensions:version"
+
+TagRow = namedtuple("TagRow", ("id", "name", "color", "slug"))
+IngredientRow = namedtuple("IngredientRow", ("id", "name", "measurement_unit"))
+
+
+class Dimensions:
+    """Read-only id -> row maps of every tag and ingredient."""
+
+    __slots__ = ("version", "tags", "ingredients")
+
+    def __init__(self, version):
+        self.version = version
+        self.tags = MappingProxyType({
+            row.id: row for row in map(
+                TagRow._make, Tag.objects.values_list(*TagRow._fields)
+            )
+        })
+        self.ingredients = MappingProxyType({
+            row.id: row for row in map(
+                IngredientRow._make,
+                Ingredient.objects.values_list(*IngredientRow._fields),
+            )
+        })
+
+
+_lock = threading.Lock()
+_current = None
+
+
+def get_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, uuid4().hex, None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def invalidate():
+    """Makes every worker reload the dimensions on the next read."""
+    cache.set(VERSION_KEY, uuid4().hex, None)
+
+
+def current(refresh=False):
+    """Dimensions of this process, reloaded when another process has
+    bumped the shared version. The version is not read while the
+    invalidation bus is listening, its messages evict the copy."""
+    global _current
+    dimensions = _current
+    if not refresh and dimensions is not None and invalidation.listening():
+        return dimensions
+    version = get_version()
+    if refresh or dimensions is None or dimensions.version != version:
+        with _lock:
+            if refresh or _current is None or _current.version != version:
+                _current = Dimensions(version)
+            dimensions = _current
+    return dimensions
+
+
+@invalidation.on_change("tag", "ingredient")
+def evict(pk=None):
+    """Waits for a load in progress, it may have read the old rows."""
+    global _current
+    with _lock:
+        _current = None
+
+
+@invalidation.on_reconnect
+def check_version():
+    global _current
+    with _lock:
+        if _current is not None and _current.version != get_version():
+            _current = None
+
+
+def prefetch_dimension_ids(recipes):
+    """Loads tag ids and ingredient amounts of the recipes from
+    the through tables, without joining the tags and ingredients."""
+    recipes = [recipe for recipe in recipes if not hasattr(recipe, "_tag_ids")]
+    if not recipes:
+        return
+    ids = [recipe.pk for recipe in recipes]
+    tag_ids = defaultdict(list)
+    for recipe_id, tag_id in Recipe.tags.through.objects.filter(
+        recipe_id__in=ids
+    ).values_list("recipe_id", "tag_id"):
+        tag_ids[recipe_id].append(tag_id)
+    amounts = defaultdict(list)
+    for recipe_id, ingredient_id, amount in IngredientInRecipe.objects.filter(
+        recipe_id__in=ids
+    ).values_list("recipe_id", "ingredient_id", "amount"):
+        amounts[recipe_id].append((ingredient_id, amount))
+    for recipe in recipes:
+        recipe._tag_ids = tag_ids[recipe.pk]
+        recipe._ingredient_amounts = amounts[recipe.pk]
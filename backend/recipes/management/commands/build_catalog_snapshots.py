@@ -0,0 +1,22 @@
+from django.core.management import BaseCommand, CommandError
+from recipes.catalog import CATALOGS, write_snapshot
+
+
+class Command(BaseCommand):
+    help = "Writes compressed json snapshots of the tags and ingredients."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "catalogs", nargs="*", help=f"any of: {', '.join(CATALOGS)}"
+        )
+
+    def handle(self, *args, **options):
+        catalogs = options["catalogs"] or CATALOGS
+        unknown = set(catalogs) - set(CATALOGS)
+        if unknown:
+            raise CommandError(f"unknown catalogs: {', '.join(unknown)}")
+        for catalog in catalogs:
+            entry = write_snapshot(catalog)
+            self.stdout.write(
+                f"{catalog}: version {entry['version']} -> {entry['path']}"
+            )
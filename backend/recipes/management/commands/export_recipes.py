@@ -0,0 +1,35 @@
+import sys
+
+from django.core.management import BaseCommand
+from recipes.models import Recipe
+from recipes.transfer import export_recipes
+
+
+class Command(BaseCommand):
+    help = (
+        "Writes the recipes with their ingredients, tags and author "
+        "emails as NDJSON, in constant memory. Media files are not "
+        "included and have to be copied separately."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output", help="file to write, standard output by default"
+        )
+        parser.add_argument("--author", help="email of a single author")
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.all()
+        if options["author"]:
+            recipes = recipes.filter(author__email=options["author"])
+        lines = export_recipes(recipes, options["chunk_size"])
+        if not options["output"]:
+            sys.stdout.writelines(lines)
+            return
+        count = 0
+        with open(options["output"], "w", encoding="utf-8") as file:
+            for line in lines:
+                file.write(line)
+                count += 1
+        self.stderr.write(f"recipes exported: {count}")
@@ -0,0 +1,192 @@
+import json
+import random
+from datetime import timedelta
+from itertools import accumulate
+from pathlib import Path
+
+from api.cards import refresh_cards
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management import BaseCommand
+from django.utils import timezone
+from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
+                            ShoppingCart, Tag)
+from users.models import Follow, User
+
+WORDS = (
+    "взбить смешать нарезать обжарить запечь посолить добавить варить "
+    "остудить подавать тесто соус начинка сковорода духовка минут"
+).split()
+
+
+class Command(BaseCommand):
+    help = (
+        "Generates a reproducible dataset of users, follows, recipes, "
+        "favorites and shopping carts with skewed popularity."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--recipes", type=int, default=10000)
+        parser.add_argument("--follows", type=int, default=20,
+                            help="average follows per user")
+        parser.add_argument("--favorites", type=int, default=30,
+                            help="average favorites per user")
+        parser.add_argument("--cart", type=int, default=5,
+                            help="average shopping cart size per user")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--data-dir", default=settings.DATA_DIR)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        tag_ids, ingredient_ids = self.load_catalog(Path(options["data_dir"]))
+        user_ids = self.create_users(options["users"], options["seed"])
+        self.create_pairs(
+            Follow, "following_id", user_ids, user_ids, options["follows"]
+        )
+        recipe_ids = self.create_recipes(
+            options["recipes"], user_ids, tag_ids, ingredient_ids
+        )
+        self.create_pairs(
+            Favorite, "recipe_id", user_ids, recipe_ids, options["favorites"]
+        )
+        self.create_pairs(
+            ShoppingCart, "recipe_id", user_ids, recipe_ids, options["cart"]
+        )
+
+    def log(self, message):
+        self.stdout.write(message)
+        self.stdout.flush()
+
+    def skewed(self, population):
+        """Cumulative Zipf weights, the first items are the most popular."""
+        return list(
+            accumulate(1 / rank for rank in range(1, len(population) + 1))
+        )
+
+    def load_catalog(self, data_dir):
+        with open(data_dir / "tags.json", encoding="utf-8") as file:
+            Tag.objects.bulk_create(
+                (Tag(**row) for row in json.load(file)),
+                ignore_conflicts=True,
+            )
+        with open(data_dir / "ingredients.json", encoding="utf-8") as file:
+            Ingredient.objects.bulk_create(
+                (Ingredient(**row) for row in json.load(file)),
+                batch_size=self.batch_size,
+                ignore_conflicts=True,
+            )
+        return (
+            list(Tag.objects.values_list("id", flat=True)),
+            list(Ingredient.objects.values_list("id", flat=True)),
+        )
+
+    def create_users(self, count, seed):
+        password = make_password("synthetic-password")
+        start = User.objects.count()
+        prefix = f"synthetic{seed}"
+        users = (
+            User(
+                username=f"{prefix}-{number}",
+                email=f"{prefix}-{number}@example.com",
+                first_name=f"Имя{number}",
+                last_name=f"Фамилия{number}",
+                password=password,
+            )
+            for number in range(start, start + count)
+        )
+        User.objects.bulk_create(
+            users, batch_size=self.batch_size, ignore_conflicts=True
+        )
+        user_ids = list(
+            User.objects.filter(username__startswith=f"{prefix}-")
+            .values_list("id", flat=True)
+        )
+        self.rng.shuffle(user_ids)
+        self.log(f"users: {len(user_ids)}")
+        return user_ids
+
+    def create_recipes(self, count, user_ids, tag_ids, ingredient_ids):
+        author_weights = self.skewed(user_ids)
+        authors = self.rng.choices(
+            user_ids, cum_weights=author_weights, k=count
+        )
+        start = Recipe.objects.count()
+        now = timezone.now()
+        recipe_ids = []
+        for offset in range(0, count, self.batch_size):
+            recipes = Recipe.objects.bulk_create(
+                Recipe(
+                    author_id=author,
+                    name=f"Рецепт {start + number}",
+                    text=" ".join(self.rng.choices(WORDS, k=40)),
+                    cooking_time=self.rng.randint(5, 180),
+                )
+                for number, author in enumerate(
+                    authors[offset:offset + self.batch_size], offset
+                )
+            )
+            if recipes and recipes[0].pk is None:
+                ids = dict(
+                    Recipe.objects.filter(
+                        name__in=[recipe.name for recipe in recipes]
+                    ).values_list("name", "id")
+                )
+                for recipe in recipes:
+                    recipe.pk = ids[recipe.name]
+            for recipe in recipes:
+                recipe.pub_date = now - timedelta(
+                    minutes=self.rng.randint(0, 60 * 24 * 365)
+                )
+            Recipe.objects.bulk_update(recipes, ("pub_date",))
+            Recipe.tags.through.objects.bulk_create(
+                Recipe.tags.through(recipe_id=recipe.pk, tag_id=tag_id)
+                for recipe in recipes
+                for tag_id in self.rng.sample(
+                    tag_ids, self.rng.randint(1, len(tag_ids))
+                )
+            )
+            IngredientInRecipe.objects.bulk_create(
+                IngredientInRecipe(
+                    recipe_id=recipe.pk,
+                    ingredient_id=ingredient_id,
+                    amount=self.rng.randint(1, 500),
+                )
+                for recipe in recipes
+                for ingredient_id in self.rng.sample(
+                    ingredient_ids, self.rng.randint(2, 12)
+                )
+            )
+            refresh_cards(Recipe.objects.filter(pk__in=[
+                recipe.pk for recipe in recipes
+            ]))
+            recipe_ids.extend(recipe.pk for recipe in recipes)
+            self.log(f"recipes: {len(recipe_ids)}/{count}")
+        return recipe_ids
+
+    def create_pairs(self, model, target_field, user_ids, targets, average):
+        """Links every user to a Zipf distributed sample of the targets,
+        the sample sizes are exponentially distributed around average."""
+        weights = self.skewed(targets)
+        pairs = []
+        total = 0
+        for user_id in user_ids:
+            size = min(int(self.rng.expovariate(1 / average)), len(targets))
+            chosen = set(
+                self.rng.choices(targets, cum_weights=weights, k=size)
+            )
+            if model is Follow:
+                chosen.discard(user_id)
+            pairs.extend(
+                model(user_id=user_id, **{target_field: target})
+                for target in chosen
+            )
+            if len(pairs) >= self.batch_size:
+                model.objects.bulk_create(pairs, ignore_conflicts=True)
+                total += len(pairs)
+                pairs = []
+        model.objects.bulk_create(pairs, ignore_conflicts=True)
+        total += len(pairs)
+        self.log(f"{model._meta.verbose_name_plural}: {total}")
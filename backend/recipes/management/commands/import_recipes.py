@@ -0,0 +1,137 @@
+import json
+import sys
+from itertools import islice
+
+from api.cards import refresh_cards
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+from recipes.models import Ingredient, IngredientInRecipe, Recipe, Tag
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Loads recipes written by export_recipes. Authors, tags and "
+        "ingredients must already exist. Recipes that an author already "
+        "has are skipped, so an interrupted import can be re-run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="NDJSON file, - for standard input")
+        parser.add_argument(
+            "--batch-size", type=int, default=1000,
+            help="recipes per transaction",
+        )
+
+    def handle(self, *args, **options):
+        self.counts = {"imported": 0, "existing": 0, "unresolved": 0}
+        if options["path"] == "-":
+            self.load(sys.stdin, options["batch_size"])
+        else:
+            with open(options["path"], encoding="utf-8") as file:
+                self.load(file, options["batch_size"])
+        self.stdout.write(", ".join(
+            f"{name}: {count}" for name, count in self.counts.items()
+        ))
+
+    def load(self, file, batch_size):
+        rows = (json.loads(line) for line in file if line.strip())
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                return
+            with transaction.atomic():
+                self.import_batch(batch)
+            self.stdout.write(f"recipes imported: {self.counts['imported']}")
+            self.stdout.flush()
+
+    def import_batch(self, batch):
+        authors = dict(
+            User.objects.filter(
+                email__in={row["author"] for row in batch}
+            ).values_list("email", "id")
+        )
+        tags = dict(
+            Tag.objects.filter(
+                slug__in={slug for row in batch for slug in row["tags"]}
+            ).values_list("slug", "id")
+        )
+        ingredients = {
+            (name, unit): pk
+            for name, unit, pk in Ingredient.objects.filter(name__in={
+                item["name"] for row in batch for item in row["ingredients"]
+            }).values_list("name", "measurement_unit", "id")
+        }
+        existing = set(
+            Recipe.objects.filter(
+                author_id__in=authors.values(),
+                name__in={row["name"] for row in batch},
+            ).values_list("author_id", "name")
+        )
+
+        recipes = {}
+        for row in batch:
+            author_id = authors.get(row["author"])
+            if (
+                author_id is None
+                or any(slug not in tags for slug in row["tags"])
+                or any(
+                    (item["name"], item["measurement_unit"]) not in ingredients
+                    for item in row["ingredients"]
+                )
+            ):
+                self.counts["unresolved"] += 1
+                continue
+            key = (author_id, row["name"])
+            if key in existing or key in recipes:
+                self.counts["existing"] += 1
+                continue
+            recipes[key] = (Recipe(
+                author_id=author_id,
+                name=row["name"],
+                text=row["text"],
+                cooking_time=row["cooking_time"],
+                image=row["image"],
+            ), row)
+        if not recipes:
+            return
+
+        created = Recipe.objects.bulk_create(
+            recipe for recipe, _ in recipes.values()
+        )
+        if created[0].pk is None:
+            ids = {
+                (author_id, name): pk
+                for pk, author_id, name in Recipe.objects.filter(
+                    author_id__in={author_id for author_id, _ in recipes},
+                    name__in={name for _, name in recipes},
+                ).values_list("id", "author_id", "name")
+            }
+            for key, (recipe, _) in recipes.items():
+                recipe.pk = ids[key]
+        for recipe, row in recipes.values():
+            recipe.pub_date = parse_datetime(row["pub_date"])
+        Recipe.objects.bulk_update(created, ("pub_date",))
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe_id=recipe.pk, tag_id=tags[slug])
+            for recipe, row in recipes.values()
+            for slug in row["tags"]
+        )
+        IngredientInRecipe.objects.bulk_create(
+            IngredientInRecipe(
+                recipe_id=recipe.pk,
+                ingredient_id=ingredients[
+                    item["name"], item["measurement_unit"]
+                ],
+                amount=item["amount"],
+            )
+            for recipe, row in recipes.values()
+            for item in row["ingredients"]
+        )
+        refresh_cards(Recipe.objects.filter(pk__in=[
+            recipe.pk for recipe in created
+        ]))
+        self.counts["imported"] += len(created)
@@ -0,0 +1,338 @@
+import csv
+import io
+import json
+from functools import partial
+from itertools import islice
+from pathlib import Path
+
+from api import invalidation
+from api.cards import refresh_cards
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
+from recipes import dimensions
+from recipes.catalog import write_snapshot
+from recipes.models import CatalogChange, Ingredient, Recipe, Tag
+
+CATALOGS = {
+    CatalogChange.TAGS: (Tag, ("slug",), ("slug", "name", "color")),
+    CatalogChange.INGREDIENTS: (
+        Ingredient,
+        ("name", "measurement_unit"),
+        ("name", "measurement_unit"),
+    ),
+}
+FORMATS = {".json": "json", ".csv": "csv", ".ndjson": "ndjson",
+           ".jsonl": "ndjson"}
+STAGING_TABLE = "catalog_staging"
+
+
+def unique_fields(model, key):
+    """Unique fields of the model besides the primary and upsert keys,
+    a row may not take their value from another row."""
+    return [
+        field.name for field in model._meta.fields
+        if field.unique and not field.primary_key and field.name not in key
+    ]
+
+
+def iter_json_array(file, chunk_size=1 << 16):
+    """Yields the objects of a top level json array without
+    reading the whole file into memory."""
+    decoder = json.JSONDecoder()
+    buffer = file.read(chunk_size).lstrip()
+    if not buffer.startswith("["):
+        raise CommandError("Expected a json array.")
+    buffer = buffer[1:]
+    while True:
+        buffer = buffer.lstrip().lstrip(",").lstrip()
+        if buffer.startswith("]"):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                raise CommandError("Truncated json array.")
+            buffer += chunk
+            continue
+        yield item
+        buffer = buffer[end:]
+
+
+def iter_ndjson(file):
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+def iter_csv(file, fields):
+    """Rows of a csv file with a header, or with the
+    columns in the order of fields when there is none."""
+    reader = csv.reader(file)
+    header = next(reader, None)
+    if header is None:
+        return
+    if set(fields) <= set(header):
+        columns = header
+    else:
+        columns = fields
+        yield dict(zip(columns, header))
+    for row in reader:
+        yield dict(zip(columns, row))
+
+
+class Command(BaseCommand):
+    help = (
+        "Loads tags and ingredients from json, csv or ndjson files. "
+        "New rows are inserted, changed tags are updated and the rest "
+        "is skipped, so it is safe to re-run. Rows that would take the "
+        "unique name of another row are reported as conflicts."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "paths", nargs="*",
+            help="tags.json and ingredients.json of DATA_DIR by default",
+        )
+        parser.add_argument(
+            "--catalog", help="tags or ingredients, guessed from file names"
+        )
+        parser.add_argument(
+            "--format", help="json, csv or ndjson, guessed from suffixes"
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--no-copy", action="store_true",
+            help="upsert through the orm on postgres too",
+        )
+
+    def handle(self, *args, **options):
+        self.batch_size = options["batch_size"]
+        self.use_copy = (
+            connection.vendor == "postgresql" and not options["no_copy"]
+        )
+        paths = options["paths"] or [
+            Path(settings.DATA_DIR) / f"{catalog}.json" for catalog in CATALOGS
+        ]
+        for path in map(Path, paths):
+            catalog = options["catalog"] or path.name.split(".")[0]
+            if catalog not in CATALOGS:
+                raise CommandError(
+                    f"Unknown catalog {catalog!r} of {path}, use --catalog."
+                )
+            file_format = options["format"] or FORMATS.get(path.suffix)
+            if file_format not in FORMATS.values():
+                raise CommandError(
+                    f"Unknown format of {path}, use --format."
+                )
+            self.invalid = 0
+            with open(path, encoding="utf-8", newline="") as file:
+                with transaction.atomic():
+                    inserted, updated, skipped, conflicts = self.load(
+                        catalog, self.read(file, file_format, catalog)
+                    )
+            self.stdout.write(
+                f"{path.name}: inserted {inserted}, updated {updated}, "
+                f"skipped {skipped}, conflicts {conflicts}"
+            )
+
+    def log(self, message):
+        self.stdout.write(message)
+        self.stdout.flush()
+
+    def read(self, file, file_format, catalog):
+        """Valid rows of the file, invalid ones are counted as skipped."""
+        fields = CATALOGS[catalog][2]
+        if file_format == "json":
+            items = iter_json_array(file)
+        elif file_format == "ndjson":
+            items = iter_ndjson(file)
+        else:
+            items = iter_csv(file, fields)
+        for item in items:
+            row = {
+                field: str(item.get(field) or "").strip() for field in fields
+            }
+            if all(row.values()):
+                yield row
+            else:
+                self.invalid += 1
+
+    def batches(self, rows, catalog):
+        read = 0
+        while True:
+            batch = list(islice(rows, self.batch_size))
+            if not batch:
+                return
+            read += len(batch)
+            self.log(f"{catalog}: {read} rows read")
+            yield batch
+
+    def load(self, catalog, rows):
+        model, key, fields = CATALOGS[catalog]
+        upsert = self.upsert_copy if self.use_copy else self.upsert_orm
+        inserted, updated, read, conflicts = upsert(
+            model, key, fields, self.batches(rows, catalog)
+        )
+        for row in conflicts:
+            self.stderr.write(
+                f"{catalog}: conflict, "
+                + ", ".join(f"{field} {row[field]!r}" for field in fields)
+                + " takes a unique value of another row"
+            )
+        self.record(catalog, inserted + updated, updated)
+        skipped = (
+            read - len(inserted) - len(updated) - len(conflicts) + self.invalid
+        )
+        return len(inserted), len(updated), skipped, len(conflicts)
+
+    def upsert_orm(self, model, key, fields, batches):
+        """Inserts new rows and updates changed ones batch by batch,
+        returns the inserted and updated ids, the rows read and the
+        conflicting rows."""
+        inserted, updated, read, conflicts = [], [], 0, []
+        values = [field for field in fields if field not in key]
+        unique = unique_fields(model, key)
+        for batch in batches:
+            read += len(batch)
+            rows = {tuple(row[field] for field in key): row for row in batch}
+            for field in unique:
+                owners = {
+                    value: tuple(row_key)
+                    for value, *row_key in model.objects.filter(**{
+                        f"{field}__in": {row[field] for row in rows.values()}
+                    }).values_list(field, *key)
+                }
+                for row_key, row in list(rows.items()):
+                    owner = owners.setdefault(row[field], row_key)
+                    if owner != row_key:
+                        conflicts.append(rows.pop(row_key))
+            existing = {
+                tuple(getattr(obj, field) for field in key): obj
+                for obj in model.objects.filter(**{
+                    f"{key[0]}__in": {row_key[0] for row_key in rows}
+                })
+            }
+            new, changed = [], []
+            for row_key, row in rows.items():
+                obj = existing.get(row_key)
+                if obj is None:
+                    new.append(row_key)
+                elif any(getattr(obj, field) != row[field]
+                         for field in values):
+                    for field in values:
+                        setattr(obj, field, row[field])
+                    changed.append(obj)
+            if changed:
+                model.objects.bulk_update(changed, values)
+                updated.extend(obj.pk for obj in changed)
+            model.objects.bulk_create(
+                (model(**rows[row_key]) for row_key in new),
+                ignore_conflicts=True,
+            )
+            new = set(new)
+            inserted.extend(
+                obj.pk for obj in model.objects.filter(**{
+                    f"{key[0]}__in": {row_key[0] for row_key in new}
+                })
+                if tuple(getattr(obj, field) for field in key) in new
+            )
+        return inserted, updated, read, conflicts
+
+    def upsert_copy(self, model, key, fields, batches):
+        """Copies the rows into a temporary staging table and
+        merges it into the catalog with a single statement. The rows
+        that ON CONFLICT of the key would not resolve are taken out
+        first, they would fail the whole statement."""
+        quote = connection.ops.quote_name
+        table = quote(model._meta.db_table)
+        columns = ", ".join(map(quote, fields))
+        key_columns = ", ".join(map(quote, key))
+
+        def qualified(alias, names):
+            return ", ".join(f"{alias}.{quote(name)}" for name in names)
+
+        values = [quote(field) for field in fields if field not in key]
+        if values:
+            action = (
+                "UPDATE SET "
+                + ", ".join(f"{value} = EXCLUDED.{value}" for value in values)
+                + f" WHERE ({', '.join(f'target.{v}' for v in values)})"
+                + " IS DISTINCT FROM "
+                + f"({', '.join(f'EXCLUDED.{v}' for v in values)})"
+            )
+        else:
+            action = "NOTHING"
+        read = 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE TEMPORARY TABLE {STAGING_TABLE} ON COMMIT DROP AS "
+                f"SELECT {columns} FROM {table} WITH NO DATA"
+            )
+            cursor.execute(
+                f"ALTER TABLE {STAGING_TABLE} ADD COLUMN position serial"
+            )
+            for batch in batches:
+                read += len(batch)
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(
+                    [row[field] for field in fields] for row in batch
+                )
+                buffer.seek(0)
+                cursor.copy_expert(
+                    f"COPY {STAGING_TABLE} ({columns}) "
+                    "FROM STDIN WITH (FORMAT csv)",
+                    buffer,
+                )
+            cursor.execute(
+                f"DELETE FROM {STAGING_TABLE} AS staged "
+                f"USING {STAGING_TABLE} AS later "
+                f"WHERE ({qualified('staged', key)}) "
+                f"= ({qualified('later', key)}) "
+                "AND staged.position < later.position"
+            )
+            conflicts = []
+            for field in map(quote, unique_fields(model, key)):
+                cursor.execute(
+                    f"DELETE FROM {STAGING_TABLE} AS staged WHERE EXISTS ("
+                    f"SELECT 1 FROM {table} AS target "
+                    f"WHERE target.{field} = staged.{field} "
+                    f"AND ({qualified('target', key)}) "
+                    f"IS DISTINCT FROM ({qualified('staged', key)})"
+                    f") OR EXISTS (SELECT 1 FROM {STAGING_TABLE} AS earlier "
+                    f"WHERE earlier.{field} = staged.{field} "
+                    "AND earlier.position < staged.position) "
+                    f"RETURNING {columns}"
+                )
+                conflicts.extend(
+                    dict(zip(fields, row)) for row in cursor.fetchall()
+                )
+            cursor.execute(
+                f"INSERT INTO {table} AS target ({columns}) "
+                f"SELECT {columns} FROM {STAGING_TABLE} "
+                f"ON CONFLICT ({key_columns}) DO {action} "
+                "RETURNING target.id, target.xmax = 0"
+            )
+            merged = cursor.fetchall()
+        inserted = [pk for pk, created in merged if created]
+        updated = [pk for pk, created in merged if not created]
+        return inserted, updated, read, conflicts
+
+    def record(self, catalog, changed, updated):
+        """Bulk writes skip the signals, so the catalog changes,
+        snapshots and cards are taken care of here."""
+        if not changed:
+            return
+        CatalogChange.objects.bulk_create(
+            CatalogChange(catalog=catalog, object_id=pk) for pk in changed
+        )
+        if updated:
+            recipes = Recipe.objects.filter(**{f"{catalog}__in": updated})
+            refresh_cards(
+                recipes.distinct(),
+                fresh_dimensions=True,
+            )
+        transaction.on_commit(partial(write_snapshot, catalog))
+        transaction.on_commit(dimensions.invalidate)
+        invalidation.publish(CATALOGS[catalog][0]._meta.model_name)
@@ -0,0 +1,18 @@
+from api.cards import refresh_cards
+from django.core.management import BaseCommand
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the precomputed recipe cards."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--author", type=int, help="only the recipes of this author id"
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.all()
+        if options["author"]:
+            recipes = recipes.filter(author_id=options["author"])
+        self.stdout.write(f"rebuilt: {refresh_cards(recipes)}")
@@ -0,0 +1,43 @@
+# Generated by Django 3.2.21 on 2026-10-19 15:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0006_alter_tag_options"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CatalogChange",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "catalog",
+                    models.CharField(
+                        choices=[("tags", "Tags"), ("ingredients", "Ingredients")],
+                        max_length=16,
+                    ),
+                ),
+                ("object_id", models.PositiveBigIntegerField()),
+                ("deleted", models.BooleanField(default=False)),
+            ],
+            options={
+                "verbose_name": "Catalog change",
+                "ordering": ("id",),
+            },
+        ),
+        migrations.AddIndex(
+            model_name="catalogchange",
+            index=models.Index(fields=["catalog", "id"], name="catalog_change_idx"),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 3.2.21 on 2026-10-19 15:13
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("recipes", "0007_catalogchange"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RecipeCard",
+            fields=[
+                (
+                    "recipe",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="card",
+                        serialize=False,
+                        to="recipes.recipe",
+                    ),
+                ),
+                ("pub_date", models.DateTimeField(db_index=True)),
+                ("card", models.JSONField()),
+                ("detail", models.JSONField()),
+                (
+                    "author",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="recipe_cards",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Recipe card",
+                "ordering": ("-pub_date",),
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 3.2.21 on 2026-10-19 15:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0008_recipecard"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(
+                fields=["-pub_date"], name="recipe_pub_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(
+                fields=["author", "-pub_date"], name="recipe_author_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="recipecard",
+            index=models.Index(
+                fields=["author", "-pub_date"], name="card_author_date_idx"
+            ),
+        ),
+        # The ?tags= filter reads recipe ids by tag id from the
+        # auto-created through table, covered by a single index.
+        migrations.RunSQL(
+            "CREATE INDEX recipe_tags_tag_recipe_idx "
+            "ON recipes_recipe_tags (tag_id, recipe_id)",
+            "DROP INDEX recipe_tags_tag_recipe_idx",
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 3.2.21 on 2026-10-19 15:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0009_query_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DeletedFile",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=255)),
+                ("created", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "verbose_name": "Deleted file",
+                "ordering": ("id",),
+            },
+        ),
+    ]
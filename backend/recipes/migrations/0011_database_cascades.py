@@ -0,0 +1,63 @@
+from django.db import migrations
+
+# Foreign keys the database cascades on its own, so that
+# recipes.deletion.fast_delete removes the referencing rows without
+# Django loading them. A migration that alters one of these fields
+# recreates its constraint without the cascade, run these again after it.
+CASCADES = (
+    ("recipes_recipe", "author_id", "users_user"),
+    ("recipes_recipe_tags", "recipe_id", "recipes_recipe"),
+    ("recipes_ingredientinrecipe", "recipe_id", "recipes_recipe"),
+    ("recipes_favorite", "recipe_id", "recipes_recipe"),
+    ("recipes_favorite", "user_id", "users_user"),
+    ("recipes_shoppingcart", "recipe_id", "recipes_recipe"),
+    ("recipes_shoppingcart", "user_id", "users_user"),
+    ("recipes_recipecard", "recipe_id", "recipes_recipe"),
+    ("recipes_recipecard", "author_id", "users_user"),
+    ("users_follow", "user_id", "users_user"),
+    ("users_follow", "following_id", "users_user"),
+)
+
+CONSTRAINT_SQL = """
+SELECT conname FROM pg_constraint
+WHERE contype = 'f'
+  AND conrelid = %s::regclass
+  AND conkey = ARRAY[(
+      SELECT attnum FROM pg_attribute
+      WHERE attrelid = %s::regclass AND attname = %s
+  )]
+"""
+
+
+def set_cascades(on_delete):
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor != "postgresql":
+            return
+        quote = schema_editor.quote_name
+        with schema_editor.connection.cursor() as cursor:
+            for table, column, target in CASCADES:
+                cursor.execute(CONSTRAINT_SQL, (table, table, column))
+                for (name,) in cursor.fetchall():
+                    schema_editor.execute(
+                        f"ALTER TABLE {quote(table)} "
+                        f"DROP CONSTRAINT {quote(name)}, "
+                        f"ADD CONSTRAINT {quote(name)} "
+                        f"FOREIGN KEY ({quote(column)}) "
+                        f'REFERENCES {quote(target)} ("id") {on_delete}'
+                        "DEFERRABLE INITIALLY DEFERRED"
+                    )
+
+    return operation
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0010_deletedfile"),
+        ("users", "0004_purgejob"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            set_cascades("ON DELETE CASCADE "), set_cascades("")
+        ),
+    ]
@@ -55,6 +55,12 @@ class Recipe(models.Model):
                 fields=["name", "author"], name="recipe_unique"
             )
         ]
+        indexes = [
+            models.Index(fields=["-pub_date"], name="recipe_pub_date_idx"),
+            models.Index(
+                fields=["author", "-pub_date"], name="recipe_author_date_idx"
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -131,3 +137,69 @@ class ShoppingCart(models.Model):
 
     def __str__(self):
         return f'{self.user} добавил "{self.recipe}" в Список покупок'
+
+
+class CatalogChange(models.Model):
+    TAGS = "tags"
+    INGREDIENTS = "ingredients"
+    CATALOG_CHOICES = (
+        (TAGS, "Tags"),
+        (INGREDIENTS, "Ingredients"),
+    )
+
+    catalog = models.CharField(max_length=16, choices=CATALOG_CHOICES)
+    object_id = models.PositiveBigIntegerField()
+    deleted = models.BooleanField(default=False)
+
+    class Meta:
+        ordering = ("id",)
+        verbose_name = "Catalog change"
+        indexes = [
+            models.Index(fields=["catalog", "id"], name="catalog_change_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.catalog} #{self.object_id} (version {self.id})"
+
+
+class RecipeCard(models.Model):
+    """Precomputed viewer independent representation of a recipe."""
+
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="card",
+    )
+    author = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="recipe_cards"
+    )
+    pub_date = models.DateTimeField(db_index=True)
+    card = models.JSONField()
+    detail = models.JSONField()
+
+    class Meta:
+        ordering = ("-pub_date",)
+        verbose_name = "Recipe card"
+        indexes = [
+            models.Index(
+                fields=["author", "-pub_date"], name="card_author_date_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return self.card.get("name", str(self.pk))
+
+
+class DeletedFile(models.Model):
+    """Media file of a deleted object, removed by run_deletions."""
+
+    name = models.CharField(max_length=255)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ("id",)
+        verbose_name = "Deleted file"
+
+    def __str__(self):
+        return self.name
@@ -0,0 +1,35 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import dimensions
+from .catalog import write_snapshot
+from .models import CatalogChange, DeletedFile, Ingredient, Recipe, Tag
+
+CATALOG_MODELS = {
+    Tag: CatalogChange.TAGS,
+    Ingredient: CatalogChange.INGREDIENTS,
+}
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def record_catalog_change(sender, instance, **kwargs):
+    catalog = CATALOG_MODELS[sender]
+    CatalogChange.objects.create(
+        catalog=catalog,
+        object_id=instance.pk,
+        deleted="created" not in kwargs,
+    )
+    transaction.on_commit(partial(write_snapshot, catalog))
+    transaction.on_commit(dimensions.invalidate)
+
+
+@receiver(post_delete, sender=Recipe)
+def queue_recipe_image(sender, instance, **kwargs):
+    if instance.image:
+        DeletedFile.objects.create(name=instance.image.name)
@@ -0,0 +1,54 @@
+import json
+from collections import defaultdict
+from itertools import islice
+
+from .models import IngredientInRecipe, Recipe
+
+EXPORT_FIELDS = (
+    "id", "name", "text", "cooking_time", "pub_date", "image",
+    "author__email",
+)
+
+
+def export_recipes(recipes, chunk_size=2000):
+    """NDJSON lines of the recipes, read through a server-side cursor.
+
+    The author, tags and ingredients are referenced by email, slug
+    and name with unit, so the lines can be loaded into another
+    database with import_recipes. Images are exported by name only.
+    """
+    rows = (
+        recipes.order_by("pk").values_list(*EXPORT_FIELDS)
+        .iterator(chunk_size=chunk_size)
+    )
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        ids = [row[0] for row in chunk]
+        tags = defaultdict(list)
+        for recipe_id, slug in Recipe.tags.through.objects.filter(
+            recipe_id__in=ids
+        ).order_by("pk").values_list("recipe_id", "tag__slug"):
+            tags[recipe_id].append(slug)
+        ingredients = defaultdict(list)
+        for recipe_id, name, unit, amount in IngredientInRecipe.objects.filter(
+            recipe_id__in=ids
+        ).order_by("pk").values_list(
+            "recipe_id", "ingredient__name", "ingredient__measurement_unit",
+            "amount",
+        ):
+            ingredients[recipe_id].append(
+                {"name": name, "measurement_unit": unit, "amount": amount}
+            )
+        for pk, name, text, cooking_time, pub_date, image, author in chunk:
+            yield json.dumps({
+                "name": name,
+                "text": text,
+                "cooking_time": cooking_time,
+                "pub_date": pub_date.isoformat(),
+                "image": image or None,
+                "author": author,
+                "tags": tags[pk],
+                "ingredients": ingredients[pk],
+            }, ensure_ascii=False) + "\n"
@@ -1,11 +1,13 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
+from recipes.admin_utils import AutocompleteFilter, LargeTableAdmin
 
 from .models import Follow, User
+from .purge import schedule_purge
 
 
 @admin.register(User)
-class UserAdmin(UserAdmin):
+class UserAdmin(LargeTableAdmin, UserAdmin):
     list_display = (
         "username",
         "id",
@@ -13,12 +15,40 @@ class UserAdmin(UserAdmin):
         "first_name",
         "last_name",
     )
-    list_filter = ("email", "first_name")
+    list_filter = ("is_staff", "is_active")
+    actions = ("purge",)
+
+    def get_deleted_objects(self, objs, request):
+        """Lists the users only, their rows are purged in the
+        background and not loaded for the confirmation."""
+        objs = list(objs)
+        return (
+            [str(obj) for obj in objs],
+            {User._meta.verbose_name_plural: len(objs)},
+            set(),
+            [],
+        )
+
+    def delete_model(self, request, obj):
+        schedule_purge(obj)
+
+    def delete_queryset(self, request, queryset):
+        for user in queryset:
+            schedule_purge(user)
+
+    @admin.action(description="Deactivate and purge in the background")
+    def purge(self, request, queryset):
+        for user in queryset:
+            schedule_purge(user)
 
 
 @admin.register(Follow)
-class FollowAdmin(admin.ModelAdmin):
+class FollowAdmin(LargeTableAdmin):
     list_display = (
         "user",
         "following",
     )
+    list_select_related = ("user", "following")
+    list_filter = (("user", AutocompleteFilter),
+                   ("following", AutocompleteFilter))
+    autocomplete_fields = ("user", "following")
@@ -0,0 +1,167 @@
+"""Follow graph in the shared cache: frozensets of the ids every user
+follows and is followed by, loaded from the primary on a miss, updated
+when a Follow is saved or deleted. Every change first writes a new stamp
+of the entry, a process that wrote the entry and finds the stamp changed
+deletes it, so a set loaded or updated before the change is not kept.
+Entries expire after FOLLOW_GRAPH_TIMEOUT all the same.
+"""
+from collections import Counter, defaultdict
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from .models import Follow
+
+VERSION_KEY = "follow-graph:version"
+FOLLOWING = "following"
+FOLLOWERS = "followers"
+COLUMNS = {FOLLOWING: ("user_id", "following_id"),
+           FOLLOWERS: ("following_id", "user_id")}
+LOCK_SECONDS = 5
+
+
+def get_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, uuid4().hex, None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def make_key(version, direction, user_id):
+    return f"follow-graph:{version}:{direction}:{user_id}"
+
+
+def stamp_key(key):
+    return f"{key}:stamp"
+
+
+def drop_changed(stamps):
+    """Deletes the entries whose stamps changed since {key: stamp}."""
+    current = cache.get_many([stamp_key(key) for key in stamps])
+    cache.delete_many([
+        key for key, stamp in stamps.items()
+        if current.get(stamp_key(key)) != stamp
+    ])
+
+
+def load(direction, user_ids):
+    owner, other = COLUMNS[direction]
+    ids = defaultdict(set)
+    for owner_id, other_id in Follow.objects.using(DEFAULT_DB_ALIAS).filter(
+        **{f"{owner}__in": user_ids}
+    ).values_list(owner, other).iterator():
+        ids[owner_id].add(other_id)
+    return {user_id: frozenset(ids[user_id]) for user_id in user_ids}
+
+
+def get_many(direction, user_ids):
+    """{user id: frozenset of ids} with the misses loaded in one query."""
+    version = get_version()
+    keys = {make_key(version, direction, pk): pk for pk in set(user_ids)}
+    found = {keys[key]: ids for key, ids in cache.get_many(keys).items()}
+    missing = [key for key, pk in keys.items() if pk not in found]
+    if missing:
+        stamps = cache.get_many([stamp_key(key) for key in missing])
+        loaded = load(direction, [keys[key] for key in missing])
+        cache.set_many(
+            {make_key(version, direction, pk): ids
+             for pk, ids in loaded.items()},
+            settings.FOLLOW_GRAPH_TIMEOUT,
+        )
+        # A change committed during the load may have missed the entry.
+        drop_changed({key: stamps.get(stamp_key(key)) for key in missing})
+        found.update(loaded)
+    return found
+
+
+def following(user_id):
+    return get_many(FOLLOWING, (user_id,))[user_id]
+
+
+def followers(user_id):
+    return get_many(FOLLOWERS, (user_id,))[user_id]
+
+
+def is_following(user_id, author_id):
+    return author_id in following(user_id)
+
+
+def following_count(user_id):
+    return len(following(user_id))
+
+
+def followers_count(user_id):
+    return len(followers(user_id))
+
+
+def mutuals(user_id):
+    """Ids of the users that follow user_id back."""
+    return following(user_id) & followers(user_id)
+
+
+def suggestions(user_id, limit=10):
+    """Authors followed by the most of the people user_id follows,
+    excluding the ones user_id already follows."""
+    followed = following(user_id)
+    counts = Counter()
+    for ids in get_many(FOLLOWING, followed).values():
+        counts.update(ids)
+    for pk in followed | {user_id}:
+        counts.pop(pk, None)
+    return [pk for pk, _ in counts.most_common(limit)]
+
+
+def update(direction, user_id, other_id, add):
+    """Changes a cached set in place. If another process is changing
+    it at the same time the entry is deleted, and the other process
+    deletes it too once it sees the new stamp, so the next read loads
+    it from the database."""
+    key = make_key(get_version(), direction, user_id)
+    stamp = uuid4().hex
+    cache.set(stamp_key(key), stamp, settings.FOLLOW_GRAPH_TIMEOUT)
+    lock = f"{key}:lock"
+    if not cache.add(lock, True, LOCK_SECONDS):
+        cache.delete(key)
+        return
+    try:
+        ids = cache.get(key)
+        if ids is not None:
+            ids = ids | {other_id} if add else ids - {other_id}
+            cache.set(key, ids, settings.FOLLOW_GRAPH_TIMEOUT)
+            drop_changed({key: stamp})
+    finally:
+        cache.delete(lock)
+
+
+def changed(user_id, author_id, add):
+    """Applies a follow or unfollow once the transaction commits."""
+    def apply():
+        update(FOLLOWING, user_id, author_id, add)
+        update(FOLLOWERS, author_id, user_id, add)
+
+    transaction.on_commit(apply)
+
+
+def rebuild(batch_size=5000):
+    """Writes the whole graph under a new version and switches to it,
+    entries of the previous version expire on their own."""
+    version = uuid4().hex
+    edges = {FOLLOWING: defaultdict(set), FOLLOWERS: defaultdict(set)}
+    for user_id, author_id in Follow.objects.using(
+        DEFAULT_DB_ALIAS
+    ).values_list("user_id", "following_id").iterator(chunk_size=batch_size):
+        edges[FOLLOWING][user_id].add(author_id)
+        edges[FOLLOWERS][author_id].add(user_id)
+    for direction, sets in edges.items():
+        items = list(sets.items())
+        for start in range(0, len(items), batch_size):
+            cache.set_many(
+                {make_key(version, direction, pk): frozenset(ids)
+                 for pk, ids in items[start:start + batch_size]},
+                settings.FOLLOW_GRAPH_TIMEOUT,
+            )
+    cache.set(VERSION_KEY, version, None)
+    return {direction: len(sets) for direction, sets in edges.items()}
@@ -0,0 +1,16 @@
+from django.core.management import BaseCommand
+from users import graph
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the cached follow graph from the Follow table."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        counts = graph.rebuild(options["batch_size"])
+        self.stdout.write(
+            f"following sets: {counts[graph.FOLLOWING]}, "
+            f"follower sets: {counts[graph.FOLLOWERS]}"
+        )
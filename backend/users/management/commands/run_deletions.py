@@ -0,0 +1,39 @@
+from time import sleep
+
+from django.conf import settings
+from django.core.management import BaseCommand
+from recipes.deletion import delete_queued_files
+from users.models import PurgeJob
+from users.purge import purge
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs the scheduled user purges and removes the queued media "
+        "files of deleted recipes, until stopped or with --once."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=settings.DELETION_BATCH_SIZE
+        )
+        parser.add_argument("--interval", type=float, default=10)
+        parser.add_argument("--once", action="store_true")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        while True:
+            for job in PurgeJob.objects.filter(finished__isnull=True):
+                deleted = purge(job, batch_size)
+                self.stdout.write(f"purged {job}: {deleted} rows")
+            files = 0
+            while True:
+                done = delete_queued_files(batch_size)
+                files += done
+                if done < batch_size:
+                    break
+            if files:
+                self.stdout.write(f"removed {files} queued files")
+            if options["once"]:
+                return
+            sleep(options["interval"])
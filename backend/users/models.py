@@ -23,6 +23,32 @@ class User(AbstractUser):
     def __str__(self):
         return self.username
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._loaded_values = {
+            field.attname: getattr(self, field.attname)
+            for field in self._meta.concrete_fields
+            if field.attname in self.__dict__
+        }
+
+    def changed_fields(self, names):
+        """The names whose values differ from the ones last loaded or
+        saved, all of them for an instance that was neither."""
+        loaded = getattr(self, "_loaded_values", None)
+        if loaded is None:
+            return set(names)
+        return {
+            name for name in names
+            if name in self.__dict__
+            and (name not in loaded or getattr(self, name) != loaded[name])
+        }
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -37,3 +63,19 @@ class Follow(models.Model):
                 fields=["user", "following"], name="unique_follower"
             ),
         ]
+
+
+class PurgeJob(models.Model):
+    """Deletion of a deactivated user and of everything they own,
+    done in chunks by run_deletions."""
+
+    user_id = models.PositiveBigIntegerField(unique=True)
+    created = models.DateTimeField(auto_now_add=True)
+    finished = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ("id",)
+        verbose_name = "Purge job"
+
+    def __str__(self):
+        return f"user #{self.user_id}"
@@ -0,0 +1,72 @@
+"""Removal of users with many recipes, favorites and follows.
+
+The API and the admin only deactivate the user and schedule a PurgeJob.
+run_deletions then deletes their rows in chunks, every chunk in a
+transaction of its own, so no request or lock lasts for long.
+"""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from recipes.deletion import (cascades, delete_ids, delete_recipes,
+                              fast_delete)
+from recipes.models import Favorite, Recipe, ShoppingCart
+from rest_framework.authtoken.models import Token
+
+from . import graph
+from .models import Follow, PurgeJob
+
+User = get_user_model()
+
+
+@transaction.atomic
+def schedule_purge(user):
+    """Logs the user out everywhere and queues the deletion."""
+    user.is_active = False
+    user.save(update_fields=("is_active",))
+    Token.objects.filter(user=user).delete()
+    PurgeJob.objects.get_or_create(user_id=user.pk)
+
+
+def delete_follows(queryset):
+    if not cascades(Follow):
+        return queryset.delete()[0]
+    pairs = list(queryset.values_list("pk", "user_id", "following_id"))
+    deleted = delete_ids(Follow, [pk for pk, _, _ in pairs])
+    for _, user_id, following_id in pairs:
+        graph.changed(user_id, following_id, add=False)
+    return deleted
+
+
+def delete_in_chunks(queryset, delete, batch_size):
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            ids = list(queryset.values_list("pk", flat=True)[:batch_size])
+            if not ids:
+                return deleted
+            deleted += delete(queryset.model.objects.filter(pk__in=ids))
+
+
+def purge(job, batch_size):
+    """Deletes the user of the job and their rows, returns the count."""
+    user_id = job.user_id
+    deleted = sum(
+        delete_in_chunks(queryset, delete, batch_size)
+        for queryset, delete in (
+            (Recipe.objects.filter(author_id=user_id), delete_recipes),
+            (Favorite.objects.filter(user_id=user_id), fast_delete),
+            (ShoppingCart.objects.filter(user_id=user_id), fast_delete),
+            (
+                Follow.objects.filter(
+                    Q(user_id=user_id) | Q(following_id=user_id)
+                ),
+                delete_follows,
+            ),
+        )
+    )
+    with transaction.atomic():
+        deleted += User.objects.filter(pk=user_id).delete()[0]
+        job.finished = timezone.now()
+        job.save(update_fields=("finished",))
+    return deleted
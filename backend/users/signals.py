@@ -0,0 +1,16 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import graph
+from .models import Follow
+
+
+@receiver(post_save, sender=Follow)
+def add_follow(sender, instance, created, **kwargs):
+    if created:
+        graph.changed(instance.user_id, instance.following_id, add=True)
+
+
+@receiver(post_delete, sender=Follow)
+def remove_follow(sender, instance, **kwargs):
+    graph.changed(instance.user_id, instance.following_id, add=False)
@@ -1,3 +1,4 @@
+from api.asynchronous import async_patterns
 from django.urls import include, path
 from rest_framework import routers
 
@@ -9,7 +10,7 @@ router = routers.DefaultRouter()
 router.register("users", CustomUserViewSet, basename="users")
 
 urlpatterns = [
-    path("", include(router.urls)),
+    path("", include(async_patterns(router.urls, ("subscriptions",)))),
     path("", include("djoser.urls")),
     path("auth/", include("djoser.urls.authtoken")),
 ]
@@ -1,23 +1,97 @@
+from api.events import issue_ticket, publish
+from api.mixins import BatchRetrieveMixin, SparseFieldsetMixin
 from api.pagination import CustomPagination
-from api.serializers import FollowSerializer
+from api.serializers import FollowSerializer, recipes_limit
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import (BooleanField, Count, Exists, OuterRef,
+                              Prefetch, Value)
 from django.shortcuts import get_object_or_404
 from djoser.views import UserViewSet
+from recipes.models import Recipe
 from rest_framework import status
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from users import graph
 from users.models import Follow
+from users.purge import schedule_purge
 
 User = get_user_model()
 
 
-class CustomUserViewSet(UserViewSet):
+class CustomUserViewSet(BatchRetrieveMixin, SparseFieldsetMixin, UserViewSet):
     """Users actions."""
 
     queryset = User.objects.all()
     pagination_class = CustomPagination
     link_model = Follow
+    expandable = ("recipes",)
+    model_fields = ("email", "username", "first_name", "last_name")
+    throttle_scopes = {"subscribe": "writes", "delete_subscribe": "writes"}
+
+    def get_queryset(self):
+        if self.action == "subscriptions":
+            return self.annotate_recipes(self.annotate_subscribed(
+                self.apply_fieldset(
+                    User.objects.filter(following__user=self.request.user)
+                    .order_by("id")
+                )
+            ))
+        queryset = super().get_queryset()
+        if self.action in ("list", "retrieve"):
+            return self.annotate_subscribed(self.apply_fieldset(queryset))
+        return queryset
+
+    def get_serializer_class(self):
+        if self.action == "subscriptions":
+            return FollowSerializer
+        return super().get_serializer_class()
+
+    def apply_fieldset(self, queryset):
+        """Loads only the user columns the requested fields need."""
+        fields, _ = self.get_fieldset()
+        if fields is None:
+            return queryset
+        return queryset.only(
+            "id", *(field for field in self.model_fields if field in fields)
+        )
+
+    def annotate_subscribed(self, queryset):
+        """is_subscribed of every user in the same query."""
+        fields, _ = self.get_fieldset()
+        if fields is not None and "is_subscribed" not in fields:
+            return queryset
+        user = self.request.user
+        if not user.is_authenticated:
+            return queryset.annotate(
+                is_subscribed=Value(False, output_field=BooleanField())
+            )
+        return queryset.annotate(is_subscribed=Exists(
+            Follow.objects.filter(user=user, following=OuterRef("pk"))
+        ))
+
+    def annotate_recipes(self, queryset):
+        """recipes_count and the first recipes_limit recipes of every
+        author in one query each instead of two queries per author."""
+        fields, _ = self.get_fieldset()
+        if fields is None or "recipes_count" in fields:
+            queryset = queryset.annotate(recipes_count=Count("recipes"))
+        if fields is not None and "recipes" not in fields:
+            return queryset
+        recipes = Recipe.objects.only(
+            "id", "name", "image", "cooking_time", "author_id"
+        )
+        limit = recipes_limit(self.request)
+        if limit is not None:
+            recipes = recipes.filter(pk__in=Recipe.objects.filter(
+                author=OuterRef("author")
+            ).values("pk")[:limit])
+        return queryset.prefetch_related(Prefetch("recipes", recipes))
+
+    def perform_destroy(self, instance):
+        schedule_purge(instance)
 
     def get_permissions(self):
         if self.action == "me":
@@ -35,7 +109,17 @@ class CustomUserViewSet(UserViewSet):
             following, data=request.data, context={"request": request}
         )
         serializer.is_valid(raise_exception=True)
-        Follow.objects.create(user=user, following=following)
+        try:
+            with transaction.atomic():
+                Follow.objects.create(user=user, following=following)
+        except IntegrityError:
+            # The follow graph in the cache missed it, catch it up.
+            graph.changed(user.pk, following.pk, add=True)
+            return Response(
+                {"error": "You are already subscribed to this user"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        publish(user.pk, "subscription", following.pk, True)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @subscribe.mapping.delete
@@ -43,21 +127,33 @@ class CustomUserViewSet(UserViewSet):
         user = request.user
         following_id = self.kwargs.get("id")
         following = get_object_or_404(User, id=following_id)
-        subscription = Follow.objects.filter(user=user, following=following)
-        if subscription.exists():
-            subscription.delete()
+        deleted, _ = Follow.objects.filter(
+            user=user, following=following
+        ).delete()
+        if deleted:
+            publish(user.pk, "subscription", following.pk, False)
             return Response(status=status.HTTP_204_NO_CONTENT)
         return Response(
             {"error": "You can not unsubscribe twice"},
             status=status.HTTP_400_BAD_REQUEST,
         )
 
+    @action(detail=False, methods=("post",), url_path="me/events/ticket",
+            permission_classes=(IsAuthenticated,))
+    def events_ticket(self, request):
+        """Single use ticket that opens the event stream."""
+        return Response(
+            {
+                "ticket": issue_ticket(request.user.pk),
+                "expires_in": settings.EVENTS_TICKET_TIMEOUT,
+            },
+            status=status.HTTP_201_CREATED,
+        )
+
     @action(detail=False, permission_classes=[IsAuthenticated])
     def subscriptions(self, request):
-        user = request.user
-        queryset = User.objects.filter(following__user=user)
-        pages = self.paginate_queryset(queryset)
+        pages = self.paginate_queryset(self.get_queryset())
         serializer = FollowSerializer(
-            pages, many=True, context={"request": request}
+            pages, many=True, context=self.get_serializer_context()
         )
         return self.get_paginated_response(serializer.data)